@@ -3,6 +3,7 @@ from .pusher import pusher_client
 import asyncio
 
 # app/crud.py
+import logging
 from datetime import datetime, timedelta, date
 from typing import List, Optional, Any
 import os
@@ -12,7 +13,7 @@ import random
 from firebase_admin import messaging
 
 from pydantic import BaseModel
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, delete, lambda_stmt, select
 from sqlalchemy.orm import Session
 
 from . import models, schemas, utils
@@ -24,6 +25,8 @@ ACTIVATION_CODES_FILE = os.path.join(
 
 file_lock = threading.Lock()
 
+logger = logging.getLogger(__name__)
+
 def create_password_reset_token(db: Session, user: models.User) -> str:
     token = secrets.token_urlsafe(32)
     user.reset_password_token = token
@@ -161,12 +164,10 @@ def get_user(db: Session, user_id: int) -> Optional[models.User]:
 
 
 def create_user(db: Session, user: schemas.UserCreate) -> models.User:
-    print("Inside create_user function")
     hashed_password = get_password_hash(user.password)
-    print(f"Password hashed for user: {user.email}")
 
     new_user_id = utils.generate_unique_id(db)
-    print(f"Generated unique ID: {new_user_id}")
+    logger.debug("Generated unique ID %s for user %s", new_user_id, user.email)
 
     verification_token = secrets.token_urlsafe(32)
 
@@ -189,24 +190,15 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
         reset_password_code=None,
         reset_password_code_expires=None,
     )
-    print("User model instance created")
-
     try:
-        print("Adding user to session")
         db.add(db_user)
-        print("Committing to database")
         db.commit()
-        print("Commit successful")
         db.refresh(db_user)
-        print("User refreshed from database")
         return db_user
-    except Exception as e:
-        print(f"!!! EXCEPTION DURING DB COMMIT IN create_user: {e}")
-        print(f"!!! User ID that caused the error: {new_user_id}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("DB commit failed in create_user (user id %s)", new_user_id)
         db.rollback()
-        raise e
+        raise
 
 
 def set_user_unlocked(
@@ -440,9 +432,6 @@ def get_tasks(
         .limit(limit)
         .all()
     )
-    print(f"Found {len(tasks)} tasks for user {user_id}")
-    for task in tasks:
-        print(f"Task ID: {task.id}, Owner ID: {task.owner_id}")
     return tasks
 
 def get_task(db: Session, task_id: int, user_id: int) -> Optional[models.Task]:
@@ -566,12 +555,42 @@ def delete_note(db: Session, note_id: int, user_id: int) -> bool:
     return False
 
 
+def get_friendship_between(db: Session, user_id: int, friend_id: int) -> Optional[models.Friendship]:
+    """Find a friendship between two users in either direction.
+
+    Built with lambda_stmt so SQLAlchemy caches the compiled SQL for this
+    hot lookup instead of rebuilding the expression tree on every request.
+    """
+    stmt = lambda_stmt(
+        lambda: select(models.Friendship).where(
+            ((models.Friendship.user_id == user_id) & (models.Friendship.friend_id == friend_id)) |
+            ((models.Friendship.user_id == friend_id) & (models.Friendship.friend_id == user_id))
+        )
+    )
+    return db.execute(stmt).scalars().first()
+
+
+def cancel_pending_request(db: Session, user_id: int, friend_id: int) -> bool:
+    """Delete a pending friend request sent by user_id in one round trip.
+
+    DELETE ... RETURNING replaces the old SELECT-then-delete pair: the
+    returned id doubles as the existence check.
+    """
+    result = db.execute(
+        delete(models.Friendship).where(
+            models.Friendship.user_id == user_id,
+            models.Friendship.friend_id == friend_id,
+            models.Friendship.status == "pending",
+        ).returning(models.Friendship.id)
+    )
+    deleted = result.first() is not None
+    db.commit()
+    return deleted
+
+
 def send_friend_request(db: Session, user_id: int, friend_id: int) -> Optional[models.Friendship]:
     # Check if a request already exists in either direction or if they are already friends
-    existing_request = db.query(models.Friendship).filter(
-        ((models.Friendship.user_id == user_id) & (models.Friendship.friend_id == friend_id)) |
-        ((models.Friendship.user_id == friend_id) & (models.Friendship.friend_id == user_id))
-    ).first()
+    existing_request = get_friendship_between(db, user_id, friend_id)
 
     if existing_request:
         return None # Request already exists or they are already friends
@@ -596,9 +615,9 @@ def send_friend_request(db: Session, user_id: int, friend_id: int) -> Optional[m
                 },
             )
             messaging.send(message)
-            print(f"Sent FCM friend request notification to user {friend_id}")
-    except Exception as e:
-        print(f"Error sending FCM notification for friend request: {e}")
+            logger.debug("Sent FCM friend request notification to user %s", friend_id)
+    except Exception:
+        logger.exception("Error sending FCM notification for friend request")
 
     return db_friendship
 
@@ -653,17 +672,17 @@ def find_user_by_id_or_email(db: Session, identifier: Any) -> Optional[models.Us
 
 
 def remove_friendship(db: Session, user_id: int, friend_id: int) -> bool:
-    # Find the friendship in either direction
-    friendship = db.query(models.Friendship).filter(
-        ((models.Friendship.user_id == user_id) & (models.Friendship.friend_id == friend_id) & (models.Friendship.status == "accepted")) |
-        ((models.Friendship.user_id == friend_id) & (models.Friendship.friend_id == user_id) & (models.Friendship.status == "accepted"))
-    ).first()
-
-    if friendship:
-        db.delete(friendship)
-        db.commit()
-        return True
-    return False
+    # Delete the friendship in either direction with a single statement;
+    # RETURNING tells us whether a row existed without a separate SELECT.
+    result = db.execute(
+        delete(models.Friendship).where(
+            ((models.Friendship.user_id == user_id) & (models.Friendship.friend_id == friend_id) & (models.Friendship.status == "accepted")) |
+            ((models.Friendship.user_id == friend_id) & (models.Friendship.friend_id == user_id) & (models.Friendship.status == "accepted"))
+        ).returning(models.Friendship.id)
+    )
+    deleted = result.first() is not None
+    db.commit()
+    return deleted
 
 
 
@@ -14,7 +14,13 @@ if not SQLALCHEMY_DATABASE_URL:
     raise ValueError("DATABASE_URL not found in environment variables.")
 
 # 2. إنشاء محرك الاتصال
-engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
+# insertmanyvalues_page_size controls how many rows go into one multi-row
+# INSERT when we bulk-insert (e.g. generated habit events).
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    pool_pre_ping=True,
+    insertmanyvalues_page_size=1000,
+)
 
 # 3. إنشاء فئة جلسة العمل
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
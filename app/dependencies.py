@@ -47,3 +47,35 @@ def get_current_user(
 # Previously ActiveUser was an Annotated type which caused FastAPI to treat it
 # incorrectly and attempt to parse query params like 'args'/'kwargs'.
 ActiveUser = get_current_user
+
+
+def get_friendship_map(
+    db: DatabaseDependency, current_user: models.User = Depends(get_current_user)
+) -> dict:
+    """Load the current user's whole friendship set once per request.
+
+    Returns {other_user_id: status} where pending entries are qualified by
+    direction ("pending_sent" / "pending_received"). FastAPI caches
+    dependencies per request, so endpoints that need several relation checks
+    consult this dict instead of issuing a pair-lookup query each time.
+    """
+    rows = db.query(
+        models.Friendship.user_id,
+        models.Friendship.friend_id,
+        models.Friendship.status,
+    ).filter(
+        (models.Friendship.user_id == current_user.id)
+        | (models.Friendship.friend_id == current_user.id)
+    ).all()
+
+    fmap = {}
+    for user_id, friend_id, friendship_status in rows:
+        if user_id == current_user.id:
+            other, pending = friend_id, "pending_sent"
+        else:
+            other, pending = user_id, "pending_received"
+        fmap[other] = pending if friendship_status == "pending" else friendship_status
+    return fmap
+
+
+FriendshipMap = get_friendship_map
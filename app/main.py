@@ -1,6 +1,7 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import firebase_admin
 from firebase_admin import credentials
@@ -20,7 +21,20 @@ async def lifespan(app: FastAPI):
     print("Application startup...")
     Base.metadata.create_all(bind=engine)
     print("Database tables created successfully!")
-    
+
+    # Guard against a router being registered twice (duplicate routes double
+    # the dispatch table walked on every request and keep duplicate APIRoute
+    # objects alive in memory).
+    seen_routes = set()
+    for route in app.routes:
+        methods = getattr(route, "methods", None) or []
+        for method in methods:
+            key = (route.path, method)
+            if key in seen_routes:
+                raise RuntimeError(f"Duplicate route registered: {method} {route.path}")
+            seen_routes.add(key)
+
+
     # Initialize Firebase Admin SDK
     # Prioritize initializing from environment variable (for Vercel)
     firebase_cred_json_str = os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON")
@@ -76,7 +90,10 @@ app = FastAPI(
     title="TaskAI Backend API",
     description="واجهة برمجية خلفية لإدارة المهام والعادات والملاحظات",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson encodes every JSON body; endpoints not using an explicit
+    # response class get the faster encoder for free
+    default_response_class=ORJSONResponse,
 )
 
 origins = ["*"]
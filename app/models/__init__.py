@@ -1,7 +1,7 @@
 # app/models/__init__.py
 from datetime import datetime
 
-from sqlalchemy import (Boolean, Column, DateTime, Float, ForeignKey, Integer,String, Text, BigInteger, Enum, func, Date, JSON)
+from sqlalchemy import (Boolean, Column, DateTime, Float, ForeignKey, Index, Integer,String, Text, BigInteger, Enum, func, text, Date, JSON)
 from sqlalchemy.orm import relationship
 
 from ..database import Base
@@ -118,7 +118,22 @@ class Friendship(Base):
 # --- Custom Calendar System ---
 class CalendarEvent(Base):
     __tablename__ = "calendar_events"
-    
+    __table_args__ = (
+        # Conflict checks range-scan on (user_id, start_time); see the
+        # start < other_end AND end > other_start predicates in the routers
+        Index('ix_calendar_user_start', 'user_id', 'start_time'),
+        # Partial index for the 5-minute reminder sweep: only unsent events,
+        # so the range scan on start_time touches a handful of pages
+        Index(
+            'ix_cal_pending_reminders', 'start_time',
+            postgresql_where=text('notification_sent = false'),
+        ),
+        # One occurrence per habit per start time; lets event generators use
+        # INSERT ... ON CONFLICT DO NOTHING instead of existence probes
+        Index('ix_calendar_events_habit_start', 'habit_id', 'start_time', unique=True),
+    )
+
+
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
     task_id = Column(Integer, ForeignKey("tasks.id"), nullable=True)
@@ -126,6 +141,9 @@ class CalendarEvent(Base):
     event_type = Column(String(20), nullable=False, default='task', index=True)
     start_time = Column(DateTime, nullable=False)
     end_time = Column(DateTime, nullable=False)
+    # Denormalized end_time - start_time so conflict checks can filter short
+    # events in SQL instead of per-row Python arithmetic
+    duration_minutes = Column(Integer, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     notification_sent = Column(Boolean, default=False)
     
@@ -1,5 +1,5 @@
 # app/models/habit.py
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Time, Date, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Time, Date, JSON, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -8,6 +8,14 @@ from ..database import Base
 
 class Habit(Base):
     __tablename__ = "habits"
+    __table_args__ = (
+        # Partial index matching the duplicate-name probe in create_habit
+        # (user_id + name, active rows only) so it is an index-only scan
+        Index(
+            'ix_habit_user_name_active', 'user_id', 'name',
+            postgresql_where=text('is_active'),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -42,6 +50,10 @@ class Habit(Base):
     
     # Status
     is_active = Column(Boolean, nullable=False, default=True, index=True)
+
+    # Set by the background event-generation task when it hits a conflict;
+    # clients poll GET /habits/{id} to surface it
+    last_generation_error = Column(Text)
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,15 +1,17 @@
 # app/routers/calendar.py
+import logging
 from datetime import datetime, timedelta
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
 
 from app import crud, schemas
 from app.dependencies import get_current_user, get_db
 from app.models import User, CalendarEvent, Task
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/calendar",
     tags=["Calendar"],
@@ -38,31 +40,24 @@ def validate_schedule_time(
     if 1 <= duration_minutes <= 10:
         return  # No conflict check needed for short tasks
     
-    # Build query for overlapping events
+    # Canonical half-open overlap test: two intervals overlap iff each one
+    # starts before the other ends. Equivalent to the old 3-branch OR but a
+    # single range scan on (user_id, start_time)
     query = db.query(CalendarEvent).filter(
         CalendarEvent.user_id == user_id,
-        or_(
-            # New event starts during existing event
-            and_(CalendarEvent.start_time <= start_time, CalendarEvent.end_time > start_time),
-            # New event ends during existing event
-            and_(CalendarEvent.start_time < end_time, CalendarEvent.end_time >= end_time),
-            # New event completely contains existing event
-            and_(CalendarEvent.start_time >= start_time, CalendarEvent.end_time <= end_time)
-        )
+        CalendarEvent.start_time < end_time,
+        CalendarEvent.end_time > start_time,
+        # Short-duration events (1-10 min) can overlap; filtered in SQL via
+        # the stored duration instead of per-row timedelta arithmetic
+        CalendarEvent.duration_minutes > 10,
     )
-    
+
     # Exclude current event if updating
     if exclude_event_id:
         query = query.filter(CalendarEvent.id != exclude_event_id)
-    
+
     conflicts = query.all()
-    
-    # Filter out short-duration events (they can overlap)
-    conflicts = [
-        event for event in conflicts
-        if (event.end_time - event.start_time).total_seconds() / 60 > 10
-    ]
-    
+
     if conflicts:
         conflict_details = []
         for event in conflicts:
@@ -110,7 +105,8 @@ def schedule_task(
             user_id=current_user.id,
             task_id=task_id,
             start_time=start_time,
-            end_time=end_time
+            end_time=end_time,
+            duration_minutes=int(duration_hours * 60)
         )
         
         db.add(calendar_event)
@@ -129,8 +125,8 @@ def schedule_task(
         raise e
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        print(f"Unknown error in schedule_task: {e}")
+    except Exception:
+        logger.exception("Unknown error in schedule_task")
         raise HTTPException(status_code=500, detail="حدث خطا غير معروف")
 
 
@@ -222,7 +218,8 @@ def update_calendar_event(
     # Update event times
     event.start_time = start_time
     event.end_time = end_time
-    
+    event.duration_minutes = int(duration_minutes)
+
     db.commit()
     db.refresh(event)
     
@@ -252,14 +249,12 @@ def check_availability(
     """
     end_time = start_time + timedelta(hours=duration_hours)
     
-    # Check for overlapping events
+    # Check for overlapping events (same half-open predicate as
+    # validate_schedule_time)
     conflicts = db.query(CalendarEvent).filter(
         CalendarEvent.user_id == current_user.id,
-        or_(
-            and_(CalendarEvent.start_time <= start_time, CalendarEvent.end_time > start_time),
-            and_(CalendarEvent.start_time < end_time, CalendarEvent.end_time >= end_time),
-            and_(CalendarEvent.start_time >= start_time, CalendarEvent.end_time <= end_time)
-        )
+        CalendarEvent.start_time < end_time,
+        CalendarEvent.end_time > start_time,
     ).all()
     
     if conflicts:
@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Response, status
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_
 
@@ -8,15 +10,31 @@ from ..database import get_db
 from ..models import User
 from ..models.challenges import Challenge, ChallengeParticipant, Quiz, Question, QuestionOption
 from ..schemas_challenges import (
-    ChallengeCreate, ChallengeResponse, ChallengeListResponse, ChallengeSubmission
+    ANSWERS_ADAPTER, ChallengeCreate, ChallengeResponse, ChallengeListResponse,
+    QuizResponse
 )
 from ..dependencies import get_current_user # Assuming this exists
+from ..utils.ttl_cache import MISSING, TTLCache
 
 router = APIRouter(
     prefix="/challenges",
     tags=["challenges"],
 )
 
+# Quizzes are immutable once created, so the rendered question/option JSON is
+# cached per quiz; every participant polling the challenge reuses the bytes
+# instead of rebuilding hundreds of nested pydantic instances
+_quiz_json_cache = TTLCache(ttl_seconds=300.0, max_entries=256)
+
+
+def _render_quiz_json(quiz) -> str:
+    cached = _quiz_json_cache.get(quiz.id)
+    if cached is not MISSING:
+        return cached
+    rendered = QuizResponse.model_validate(quiz).model_dump_json(exclude_none=True)
+    _quiz_json_cache.set(quiz.id, rendered)
+    return rendered
+
 @router.post("/", response_model=ChallengeResponse)
 def create_challenge(
     challenge_data: ChallengeCreate,
@@ -91,7 +109,7 @@ def create_challenge(
     db.refresh(db_challenge)
     return db_challenge
 
-@router.get("/", response_model=List[ChallengeListResponse])
+@router.get("/", response_class=ORJSONResponse)
 def get_challenges(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -123,7 +141,8 @@ def get_challenges(
         if datetime.utcnow() > c.expires_at:
             status_str = "expired"
         
-        results.append(ChallengeListResponse(
+        # Trusted DB values: skip re-validation on the way out
+        results.append(ChallengeListResponse.model_construct(
             id=c.id,
             name=c.name,
             status=status_str,
@@ -132,10 +151,12 @@ def get_challenges(
             expires_at=c.expires_at,
             my_status=my_status
         ))
-    
-    return results
 
-@router.get("/{challenge_id}", response_model=ChallengeResponse)
+    # Hand orjson plain dicts directly; exclude_none drops the frequently
+    # null my_status/description fields from the wire
+    return ORJSONResponse([r.model_dump(exclude_none=True) for r in results])
+
+@router.get("/{challenge_id}")
 def get_challenge_details(
     challenge_id: int,
     db: Session = Depends(get_db),
@@ -154,7 +175,7 @@ def get_challenge_details(
     from ..schemas_challenges import ParticipantResponse
     participants_with_names = []
     for p in challenge.participants:
-        participants_with_names.append(ParticipantResponse(
+        participants_with_names.append(ParticipantResponse.model_construct(
             id=p.id,
             user_id=p.user_id,
             status=p.status,
@@ -177,10 +198,21 @@ def get_challenge_details(
         "created_at": challenge.created_at,
         "expires_at": challenge.expires_at,
         "participants": participants_with_names,
-        "quiz": challenge.quiz
+        "quiz": None
     }
-    
-    return response_data
+
+    # Serialize straight to JSON bytes in pydantic-core; skips the
+    # jsonable_encoder dict pass and drops null fields (description,
+    # per-participant times) from the deeply nested body. The quiz subtree is
+    # rendered once per quiz and spliced in from the cache.
+    payload = ChallengeResponse.model_validate(response_data)
+    body = payload.model_dump_json(exclude_none=True)
+    if challenge.quiz:
+        body = body[:-1] + ',"quiz":' + _render_quiz_json(challenge.quiz) + '}'
+    return Response(
+        content=body,
+        media_type="application/json",
+    )
 
 @router.post("/{challenge_id}/respond")
 def respond_to_invite(
@@ -228,10 +260,17 @@ def start_challenge(
 @router.post("/{challenge_id}/finish")
 def finish_challenge(
     challenge_id: int,
-    submission: ChallengeSubmission,
+    payload: dict = Body(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    # Validate only the answers list through the precompiled adapter instead
+    # of building a ChallengeSubmission wrapper model per request
+    try:
+        answers = ANSWERS_ADAPTER.validate_python(payload.get("answers") or [])
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+
     challenge = db.query(Challenge).filter(Challenge.id == challenge_id).first()
     if not challenge:
         raise HTTPException(status_code=404, detail="Challenge not found")
@@ -267,7 +306,7 @@ def finish_challenge(
                     correct_map[q.id] = opt.id
         
         correct_count = 0
-        for ans in submission.answers:
+        for ans in answers:
             if ans.question_id in correct_map and correct_map[ans.question_id] == ans.selected_option_id:
                 correct_count += 1
         
@@ -326,23 +365,31 @@ def _check_and_award_trophies(challenge_id: int, db: Session):
         )
     
     total_participants = len(completed_participants)
-    
+
+    # Fetch every podium user in one IN query instead of one round trip per
+    # trophy
+    podium_ids = [p.user_id for p in sorted_participants[:3]]
+    users_by_id = {
+        u.id: u
+        for u in db.query(User).filter(User.id.in_(podium_ids)).all()
+    }
+
     # Award trophies
     if total_participants >= 1:
         # 1st place gets gold
-        winner = db.query(User).filter(User.id == sorted_participants[0].user_id).first()
+        winner = users_by_id.get(sorted_participants[0].user_id)
         if winner:
             winner.gold_trophies = (winner.gold_trophies or 0) + 1
-    
+
     if total_participants > 10:
         # If more than 10 participants, also award silver and bronze
         if len(sorted_participants) >= 2:
-            second_place = db.query(User).filter(User.id == sorted_participants[1].user_id).first()
+            second_place = users_by_id.get(sorted_participants[1].user_id)
             if second_place:
                 second_place.silver_trophies = (second_place.silver_trophies or 0) + 1
-        
+
         if len(sorted_participants) >= 3:
-            third_place = db.query(User).filter(User.id == sorted_participants[2].user_id).first()
+            third_place = users_by_id.get(sorted_participants[2].user_id)
             if third_place:
                 third_place.bronze_trophies = (third_place.bronze_trophies or 0) + 1
     
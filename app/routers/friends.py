@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 
 from .. import crud, schemas, models
 from ..database import get_db
-from ..dependencies import ActiveUser
+from ..dependencies import ActiveUser, FriendshipMap
 
 router = APIRouter(
     prefix="/friends",
@@ -26,10 +26,7 @@ def send_friend_request(
         raise HTTPException(status_code=404, detail="المستخدم غير موجود")
 
     # Check for existing request or friendship
-    existing_friendship = db.query(models.Friendship).filter(
-        ((models.Friendship.user_id == current_user.id) & (models.Friendship.friend_id == friendship.friend_id)) |
-        ((models.Friendship.user_id == friendship.friend_id) & (models.Friendship.friend_id == current_user.id))
-    ).first()
+    existing_friendship = crud.get_friendship_between(db, current_user.id, friendship.friend_id)
 
     if existing_friendship:
         if existing_friendship.status == "pending":
@@ -128,6 +125,7 @@ def search_user(
     user_id_or_email: str,
     db: Session = Depends(get_db),
     current_user: schemas.UserRead = Depends(ActiveUser),
+    fmap: dict = Depends(FriendshipMap),
 ):
     try:
         user_id = int(user_id_or_email)
@@ -137,25 +135,18 @@ def search_user(
 
     if not found_user:
         raise HTTPException(status_code=404, detail="المستخدم غير موجود")
-    
+
     if found_user.id == current_user.id:
         raise HTTPException(status_code=400, detail="لا يمكنك البحث عن نفسك")
 
-    # Check friendship status
-    friendship = db.query(models.Friendship).filter(
-        ((models.Friendship.user_id == current_user.id) & (models.Friendship.friend_id == found_user.id)) |
-        ((models.Friendship.user_id == found_user.id) & (models.Friendship.friend_id == current_user.id))
-    ).first()
-
-    status = "none"
-    if friendship:
-        if friendship.status == "accepted":
-            status = "friends"
-        elif friendship.status == "pending":
-            if friendship.user_id == current_user.id:
-                status = "pending_sent"
-            else:
-                status = "pending_received"
+    # Check friendship status against the per-request friendship map
+    relation = fmap.get(found_user.id)
+    if relation == "accepted":
+        status = "friends"
+    elif relation in ("pending_sent", "pending_received"):
+        status = relation
+    else:
+        status = "none"
 
     return schemas.UserSearchRead(
         id=found_user.id, 
@@ -171,36 +162,22 @@ def cancel_friend_request(
     current_user: schemas.UserRead = Depends(ActiveUser),
 ):
     """Cancel a sent friend request"""
-    # Find the pending request sent by current user
-    friendship = db.query(models.Friendship).filter(
-        models.Friendship.user_id == current_user.id,
-        models.Friendship.friend_id == friend_id,
-        models.Friendship.status == "pending"
-    ).first()
-    
-    if not friendship:
+    # Single DELETE ... WHERE round trip; no row means nothing was pending
+    if not crud.cancel_pending_request(db, current_user.id, friend_id):
         raise HTTPException(status_code=404, detail="لا يوجد طلب صداقة معلق لهذا المستخدم")
-        
-    db.delete(friendship)
-    db.commit()
     return None
 
-@router.get("/{friend_id}/profile")
+@router.get("/{friend_id}/profile", response_model=schemas.FriendProfile)
 def get_friend_profile(
     friend_id: int,
     db: Session = Depends(get_db),
     current_user: schemas.UserRead = Depends(ActiveUser),
+    fmap: dict = Depends(FriendshipMap),
 ):
     """Get detailed friend profile with statistics"""
     # Check if they are friends (unless viewing own profile)
     if friend_id != current_user.id:
-        friendship = db.query(models.Friendship).filter(
-            ((models.Friendship.user_id == current_user.id) & (models.Friendship.friend_id == friend_id)) |
-            ((models.Friendship.user_id == friend_id) & (models.Friendship.friend_id == current_user.id)),
-            models.Friendship.status == "accepted"
-        ).first()
-        
-        if not friendship:
+        if fmap.get(friend_id) != "accepted":
             raise HTTPException(status_code=403, detail="يمكنك فقط عرض ملفات تعريف أصدقائك")
     
     # Get friend user
@@ -250,19 +227,21 @@ def get_friend_profile(
             if sorted_p and sorted_p[0].user_id == friend_id:
                 challenges_won += 1
     
-    return {
-        "id": friend.id,
-        "name": friend.name,
-        "email": friend.email,
-        "created_at": friend.created_at,
-        "total_tasks": total_tasks,
-        "completed_tasks": completed_tasks,
-        "total_challenges": total_challenges,
-        "challenges_won": challenges_won,
-        "gold_trophies": friend.gold_trophies or 0,
-        "silver_trophies": friend.silver_trophies or 0,
-        "bronze_trophies": friend.bronze_trophies or 0,
-    }
+    # The data comes straight from our own rows, so model_construct skips
+    # re-validating a trusted shape while keeping the schema in OpenAPI.
+    return schemas.FriendProfile.model_construct(
+        id=friend.id,
+        name=friend.name,
+        email=friend.email,
+        created_at=friend.created_at,
+        total_tasks=total_tasks,
+        completed_tasks=completed_tasks,
+        total_challenges=total_challenges,
+        challenges_won=challenges_won,
+        gold_trophies=friend.gold_trophies or 0,
+        silver_trophies=friend.silver_trophies or 0,
+        bronze_trophies=friend.bronze_trophies or 0,
+    )
 
 
 
@@ -1,20 +1,35 @@
 # app/routers/habits.py
+import logging
+from bisect import bisect_left
+from calendar import monthrange
 from datetime import datetime, timedelta, time, date
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, load_only, raiseload, selectinload
 from sqlalchemy import and_, or_
 from pydantic import BaseModel, Field
 
-from app.models import Habit, CalendarEvent, User
+from app.schemas import FastBase
+
+from app.models import Habit, CalendarEvent, Task, User
 from app.dependencies import get_current_user, get_db
+from app.database import SessionLocal
+from app.utils.ttl_cache import MISSING, TTLCache
+
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/habits",
     tags=["Habits"],
 )
 
+# Habit details only change through PATCH/DELETE below, so repeat GETs within
+# the TTL are served from memory; keyed per (user, habit) pair
+_habit_cache = TTLCache(ttl_seconds=10.0)
+
 
 # --- Pydantic Schemas ---
 class TimeSlot(BaseModel):
@@ -71,7 +86,7 @@ class HabitUpdate(BaseModel):
     monthly_times: Optional[List[MonthlyTimeSlot]] = None
 
 
-class HabitResponse(BaseModel):
+class HabitResponse(FastBase):
     id: int
     name: str
     description: Optional[str]
@@ -80,9 +95,9 @@ class HabitResponse(BaseModel):
     duration_minutes: int
     is_active: bool
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
+    # Filled in by the background generation task on conflict; null while
+    # generation is pending or after it succeeded
+    last_generation_error: Optional[str] = None
 
 
 # --- Helper Functions ---
@@ -105,35 +120,60 @@ def validate_habit_data(habit_data: HabitCreate):
             raise ValueError("end_date must be after start_date")
 
 
-def check_habit_conflicts(user_id: int, start_time: datetime, end_time: datetime, db: Session):
+def fetch_conflict_candidates(user_id: int, window_start: datetime, window_end: datetime, db: Session):
     """
-    Check if there are conflicts with existing calendar events.
+    Pre-fetch the user's events overlapping [window_start, window_end] in one
+    query, keeping only events long enough to conflict (>10 min), sorted by
+    start_time. Returns (starts, ends, events): parallel lists of start/end
+    times plus the ORM rows, so the sweep in check_habit_conflicts compares
+    plain list elements and only touches an ORM object to report a conflict.
+    """
+    events = db.query(CalendarEvent).filter(
+        CalendarEvent.user_id == user_id,
+        CalendarEvent.start_time < window_end,
+        CalendarEvent.end_time > window_start,
+        # Short events (1-10 min) never conflict; the stored duration lets the
+        # DB drop them instead of a Python post-filter
+        CalendarEvent.duration_minutes > 10,
+    ).options(
+        # Conflict details only need the names: batch-load them with IN(...)
+        # selects instead of a lazy SELECT per conflicting event, and raise
+        # if anything else tries to lazy-load.
+        selectinload(CalendarEvent.task).load_only(Task.title),
+        selectinload(CalendarEvent.habit).load_only(Habit.name),
+        raiseload('*'),
+    ).order_by(CalendarEvent.start_time).all()
+
+    starts = [event.start_time for event in events]
+    ends = [event.end_time for event in events]
+    return starts, ends, events
+
+
+def check_habit_conflicts(start_time: datetime, end_time: datetime,
+                          starts: list, ends: list, events: list):
+    """
+    Check a candidate slot against the pre-fetched sorted event list.
     Raises ValueError with conflict details if found.
     Short habits (1-10 min) are allowed to overlap.
     """
     # Calculate duration in minutes
     duration_minutes = (end_time - start_time).total_seconds() / 60
-    
+
     # Short habits (1-10 min) can overlap with anything
     if 1 <= duration_minutes <= 10:
         return  # No conflict check needed
-    
-    # Check for overlapping events
-    conflicts = db.query(CalendarEvent).filter(
-        CalendarEvent.user_id == user_id,
-        or_(
-            and_(CalendarEvent.start_time <= start_time, CalendarEvent.end_time > start_time),
-            and_(CalendarEvent.start_time < end_time, CalendarEvent.end_time >= end_time),
-            and_(CalendarEvent.start_time >= start_time, CalendarEvent.end_time <= end_time)
-        )
-    ).all()
-    
-    # Filter out short-duration events (they can overlap)
-    conflicts = [
-        event for event in conflicts
-        if (event.end_time - event.start_time).total_seconds() / 60 > 10
-    ]
-    
+
+    # Events before this index start before end_time; check each of them for
+    # ends after start_time. Stored events may themselves overlap (the
+    # maintenance job inserts without conflict checks), so no early exit on
+    # the first non-overlapping end — a long earlier event could still
+    # conflict. The loop reads only the parallel plain lists — no
+    # instrumented ORM attribute access per iteration.
+    conflicts = []
+    for idx in range(bisect_left(starts, end_time) - 1, -1, -1):
+        if ends[idx] > start_time:
+            conflicts.append(events[idx])
+
     if conflicts:
         conflict_details = []
         for event in conflicts:
@@ -142,10 +182,10 @@ def check_habit_conflicts(user_id: int, start_time: datetime, end_time: datetime
                 start_str = event.start_time.strftime('%H:%M')
                 end_str = event.end_time.strftime('%H:%M')
                 conflict_details.append(f"{name} و من {start_str} الي {end_str}")
-            except Exception as e:
-                print(f"Error accessing event details: {e}")
+            except Exception:
+                logger.exception("Error accessing event details")
                 conflict_details.append("حدث (خطأ في التفاصيل)")
-        
+
         raise ValueError(f"الوقت مستخدم من قبل في المهمه ({', '.join(conflict_details)})")
 
 
@@ -153,19 +193,24 @@ def check_habit_conflicts(user_id: int, start_time: datetime, end_time: datetime
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=HabitResponse)
 def create_habit(
     habit_data: HabitCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """Create a new habit"""
     try:
         # Check if habit with same name exists and is active
-        existing_habit = db.query(Habit).filter(
-            Habit.user_id == current_user.id,
-            Habit.name == habit_data.name,
-            Habit.is_active == True
-        ).first()
-        
-        if existing_habit:
+        # EXISTS returns a boolean from an index-only scan instead of
+        # materializing the full habit row
+        name_taken = db.query(
+            db.query(Habit).filter(
+                Habit.user_id == current_user.id,
+                Habit.name == habit_data.name,
+                Habit.is_active == True
+            ).exists()
+        ).scalar()
+
+        if name_taken:
             raise HTTPException(status_code=400, detail="العاده مجدوله من قبل")
 
         validate_habit_data(habit_data)
@@ -173,12 +218,18 @@ def create_habit(
         raise HTTPException(status_code=400, detail=str(e))
     except HTTPException as e:
         raise e
-    except Exception as e:
-        print(f"Error in validation: {e}")
+    except Exception:
+        logger.exception("Error in habit validation")
         raise HTTPException(status_code=500, detail="حدث خطا غير معروف")
     
     # Create habit
     try:
+        # Dump each slot list once up front; model_dump is the C-implemented
+        # v2 path, unlike the deprecated per-model .dict()
+        daily_dicts = [t.model_dump() for t in habit_data.daily_times] if habit_data.daily_times else None
+        weekly_dicts = [t.model_dump() for t in habit_data.weekly_times] if habit_data.weekly_times else None
+        monthly_dicts = [t.model_dump() for t in habit_data.monthly_times] if habit_data.monthly_times else None
+
         habit = Habit(
             user_id=current_user.id,
             name=habit_data.name,
@@ -187,12 +238,12 @@ def create_habit(
             frequency=habit_data.frequency,
             duration_minutes=habit_data.duration_minutes,
             repetitions_per_day=habit_data.repetitions_per_day,
-            daily_times=[t.dict() for t in habit_data.daily_times] if habit_data.daily_times else None,
+            daily_times=daily_dicts,
             weekly_days=habit_data.weekly_days,
-            weekly_times=[t.dict() for t in habit_data.weekly_times] if habit_data.weekly_times else None,
+            weekly_times=weekly_dicts,
             repetitions_per_month=habit_data.repetitions_per_month,
             monthly_days=habit_data.monthly_days,
-            monthly_times=[t.dict() for t in habit_data.monthly_times] if habit_data.monthly_times else None,
+            monthly_times=monthly_dicts,
             start_date=habit_data.start_date,
             end_date=habit_data.end_date,
         )
@@ -200,29 +251,23 @@ def create_habit(
         db.add(habit)
         db.commit()
         db.refresh(habit)
-        
-        # Generate calendar events
-        generate_habit_events(habit, db, current_user.id)
-        
+
+        # Event expansion (up to 3 years of occurrences) runs after the
+        # response is sent; on conflict the task deactivates the habit and
+        # records the message in last_generation_error for the client to poll
+        background_tasks.add_task(
+            generate_habit_events_task, habit.id, current_user.id
+        )
         return habit
 
-    except ValueError as e:
-        # Known error (conflict) during generation
-        db.delete(habit)
-        db.commit()
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        # Unknown error during creation/generation
-        print(f"Error in creation/generation: {e}")
-        import traceback
-        traceback.print_exc()
-        if 'habit' in locals():
-            db.delete(habit)
-            db.commit()
+    except Exception:
+        # Unknown error during creation
+        logger.exception("Error in habit creation")
+        db.rollback()
         raise HTTPException(status_code=500, detail="حدث خطا غير معروف")
 
 
-@router.get("/", response_model=List[HabitResponse])
+@router.get("/", response_class=ORJSONResponse)
 def get_habits(
     is_permanent: Optional[bool] = None,
     frequency: Optional[str] = None,
@@ -232,15 +277,31 @@ def get_habits(
 ):
     """Get all user habits"""
     query = db.query(Habit).filter(Habit.user_id == current_user.id)
-    
+
     if is_permanent is not None:
         query = query.filter(Habit.is_permanent == is_permanent)
     if frequency:
         query = query.filter(Habit.frequency == frequency)
     if is_active is not None:
         query = query.filter(Habit.is_active == is_active)
-    
-    return query.order_by(Habit.created_at.desc()).all()
+
+    habits = query.order_by(Habit.created_at.desc()).all()
+
+    # Serialize straight through orjson: skips the Pydantic re-validation and
+    # jsonable_encoder pass, which dominate the cost of this list endpoint
+    return ORJSONResponse([
+        {
+            "id": h.id,
+            "name": h.name,
+            "description": h.description,
+            "is_permanent": h.is_permanent,
+            "frequency": h.frequency,
+            "duration_minutes": h.duration_minutes,
+            "is_active": h.is_active,
+            "created_at": h.created_at,
+        }
+        for h in habits
+    ])
 
 
 @router.get("/{habit_id}", response_model=HabitResponse)
@@ -250,15 +311,21 @@ def get_habit(
     current_user: User = Depends(get_current_user),
 ):
     """Get specific habit"""
+    cached = _habit_cache.get((current_user.id, habit_id))
+    if cached is not MISSING:
+        return cached
+
     habit = db.query(Habit).filter(
         Habit.id == habit_id,
         Habit.user_id == current_user.id
     ).first()
-    
+
     if not habit:
         raise HTTPException(status_code=404, detail="العادة غير موجودة")
-    
-    return habit
+
+    payload = HabitResponse.from_orm_fast(habit).model_dump()
+    _habit_cache.set((current_user.id, habit_id), payload)
+    return payload
 
 
 @router.delete("/{habit_id}", status_code=status.HTTP_200_OK)
@@ -278,7 +345,8 @@ def delete_habit(
     
     db.delete(habit)
     db.commit()
-    
+
+    _habit_cache.invalidate((current_user.id, habit_id))
     return {"message": "تم حذف العادة بنجاح"}
 
 
@@ -314,14 +382,11 @@ def update_habit(
     
     # Update time slots
     if habit_data.daily_times is not None:
-        habit.daily_times = [t.dict() for t in habit_data.daily_times]
+        habit.daily_times = [t.model_dump() for t in habit_data.daily_times]
     if habit_data.weekly_times is not None:
-        habit.weekly_times = [t.dict() for t in habit_data.weekly_times]
+        habit.weekly_times = [t.model_dump() for t in habit_data.weekly_times]
     if habit_data.monthly_times is not None:
-        habit.monthly_times = [t.dict() for t in habit_data.monthly_times]
-    
-    db.commit()
-    db.refresh(habit)
+        habit.monthly_times = [t.model_dump() for t in habit_data.monthly_times]
     
     # Delete all FUTURE calendar events for this habit
     now = datetime.utcnow()
@@ -329,17 +394,22 @@ def update_habit(
         CalendarEvent.habit_id == habit_id,
         CalendarEvent.start_time >= now
     ).delete(synchronize_session=False)
-    
-    db.commit()
-    
-    print(f"Deleted {deleted_count} future events for habit {habit_id}")
-    
-    # Regenerate events with new schedule
+
+    logger.debug("Deleted %d future events for habit %d", deleted_count, habit_id)
+
+    # Regenerate events with new schedule; one transaction covers the field
+    # updates, the delete and the new events, so a conflict rolls everything
+    # back instead of leaving the habit with a hole in its schedule
     try:
         generate_habit_events(habit, db, current_user.id)
     except ValueError as e:
+        db.rollback()
         raise HTTPException(status_code=400, detail=f"خطأ في إعادة الجدولة: {str(e)}")
-    
+
+    db.commit()
+    db.refresh(habit)
+
+    _habit_cache.invalidate((current_user.id, habit_id))
     return habit
 
 
@@ -347,130 +417,189 @@ def update_habit(
 def generate_habit_events(habit: Habit, db: Session, user_id: int):
     """Generate calendar events for a habit"""
     if habit.frequency == 'daily':
-        _generate_daily_events(habit, db, user_id)
+        slots, horizon_days, factory = habit.daily_times, 90, _daily_occurrences
     elif habit.frequency == 'weekly':
-        _generate_weekly_events(habit, db, user_id)
+        slots, horizon_days, factory = habit.weekly_times, 365, _weekly_occurrences
     elif habit.frequency == 'monthly':
-        _generate_monthly_events(habit, db, user_id)
-
+        slots, horizon_days, factory = habit.monthly_times, 1095, _monthly_occurrences
+    else:
+        return
 
-def _generate_daily_events(habit: Habit, db: Session, user_id: int):
-    """Generate events for daily habits"""
-    if not habit.daily_times:
+    if not slots:
         return
-    
+
     # Determine date range
     if habit.is_permanent:
         start = date.today()
-        end = start + timedelta(days=90)  # Generate 3 months ahead
+        end = start + timedelta(days=horizon_days)
     else:
         start = habit.start_date
         end = habit.end_date
-    
-    current_date = start
-    while current_date <= end:
-        for time_slot in habit.daily_times:
-            start_time = datetime.combine(current_date, time(time_slot['hour'], time_slot['minute']))
-            end_time = start_time + timedelta(minutes=habit.duration_minutes)
-            
-            # Check conflicts
-            try:
-                check_habit_conflicts(user_id, start_time, end_time, db)
-            except ValueError as e:
-                raise ValueError(f"تعارض في {current_date}: {str(e)}")
-            
-            # Create event
-            event = CalendarEvent(
-                user_id=user_id,
-                habit_id=habit.id,
-                event_type='habit',
-                start_time=start_time,
-                end_time=end_time
-            )
-            db.add(event)
-        
-        current_date += timedelta(days=1)
-    
-    db.commit()
 
+    duration = timedelta(minutes=habit.duration_minutes)
+    _generate_events_windowed(habit, db, user_id, start, end, factory(slots, duration))
 
-def _generate_weekly_events(habit: Habit, db: Session, user_id: int):
-    """Generate events for weekly habits"""
-    if not habit.weekly_times:
-        return
-    
-    # Determine date range
-    if habit.is_permanent:
-        start = date.today()
-        end = start + timedelta(days=365)  # Generate 1 year ahead for weekly habits
-    else:
-        start = habit.start_date
-        end = habit.end_date
-    
-    current_date = start
-    while current_date <= end:
-        for time_slot in habit.weekly_times:
-            if current_date.weekday() != (time_slot['day'] - 1) % 7:  # Adjust for Sunday=0
-                continue
-            
-            start_time = datetime.combine(current_date, time(time_slot['hour'], time_slot['minute']))
-            end_time = start_time + timedelta(minutes=habit.duration_minutes)
-            
+
+def generate_habit_events_task(habit_id: int, user_id: int):
+    """Background task: expand a habit's schedule into calendar events.
+
+    Runs after the POST /habits response has been sent, with its own session.
+    On a scheduling conflict the habit is deactivated and the message stored
+    in last_generation_error so the client can surface it on its next poll.
+    """
+    with SessionLocal() as db:
+        habit = db.query(Habit).filter(
+            Habit.id == habit_id,
+            Habit.user_id == user_id
+        ).first()
+        if not habit:
+            return
+
+        try:
+            generate_habit_events(habit, db, user_id)
+            db.commit()
+        except ValueError as e:
+            db.rollback()
+            habit.is_active = False
+            habit.last_generation_error = str(e)
+            db.commit()
+        except Exception:
+            logger.exception("Error generating events for habit %d", habit_id)
+            db.rollback()
+            habit.is_active = False
+            habit.last_generation_error = "حدث خطا غير معروف"
+            db.commit()
+
+        _habit_cache.invalidate((user_id, habit_id))
+
+
+# Events are generated and inserted in windows of this many days so that the
+# conflict-candidate list and the pending row dicts stay bounded no matter how
+# long the habit runs (a 3-year monthly habit no longer holds everything at once)
+GENERATION_WINDOW_DAYS = 90
+
+_ONE_DAY = timedelta(days=1)
+_ONE_WEEK = timedelta(days=7)
+
+
+def _generate_events_windowed(habit: Habit, db: Session, user_id: int,
+                              start: date, end: date, occurrences_in):
+    """Generate and insert events window by window.
+
+    occurrences_in(window_start, window_end) yields
+    (start_time, end_time) tuples for one window. Each window
+    prefetches its own conflict candidates and bulk-inserts its rows before
+    moving on, capping peak memory. The caller owns the transaction and
+    commits (or rolls back) once, keeping habit + events all-or-nothing.
+    """
+    window_start = start
+    while window_start <= end:
+        window_end = min(window_start + timedelta(days=GENERATION_WINDOW_DAYS - 1), end)
+
+        # An occurrence starting late on window_end can run past midnight, so
+        # the candidate fetch reaches one habit-duration beyond the window to
+        # catch events on the following day it could overlap
+        starts, ends, events = fetch_conflict_candidates(
+            user_id,
+            datetime.combine(window_start, time.min),
+            datetime.combine(window_end, time.max)
+            + timedelta(minutes=habit.duration_minutes),
+            db,
+        )
+
+        rows = []
+        for start_time, end_time in occurrences_in(window_start, window_end):
             try:
-                check_habit_conflicts(user_id, start_time, end_time, db)
+                check_habit_conflicts(start_time, end_time, starts, ends, events)
             except ValueError as e:
-                raise ValueError(f"تعارض في {current_date}: {str(e)}")
-            
-            event = CalendarEvent(
-                user_id=user_id,
-                habit_id=habit.id,
-                event_type='habit',
-                start_time=start_time,
-                end_time=end_time
+                raise ValueError(f"تعارض في {start_time.date()}: {str(e)}")
+
+            rows.append({
+                'user_id': user_id,
+                'habit_id': habit.id,
+                'event_type': 'habit',
+                'start_time': start_time,
+                'end_time': end_time,
+                'duration_minutes': habit.duration_minutes,
+            })
+
+        if rows:
+            # The unique (habit_id, start_time) index makes regeneration
+            # idempotent: occurrences that already exist (e.g. earlier today,
+            # kept by update_habit) are skipped instead of duplicated
+            db.execute(
+                pg_insert(CalendarEvent)
+                .on_conflict_do_nothing(index_elements=['habit_id', 'start_time']),
+                rows,
             )
-            db.add(event)
-        
-        current_date += timedelta(days=1)
-    
-    db.commit()
 
+        window_start = window_end + timedelta(days=1)
 
-def _generate_monthly_events(habit: Habit, db: Session, user_id: int):
-    """Generate events for monthly habits"""
-    if not habit.monthly_times:
-        return
-    
-    # Determine date range
-    if habit.is_permanent:
-        start = date.today()
-        end = start + timedelta(days=1095)  # Generate 3 years ahead for monthly habits
-    else:
-        start = habit.start_date
-        end = habit.end_date
-    
-    current_date = start
-    while current_date <= end:
-        for time_slot in habit.monthly_times:
-            if current_date.day != time_slot['day']:
-                continue
-            
-            start_time = datetime.combine(current_date, time(time_slot['hour'], time_slot['minute']))
-            end_time = start_time + timedelta(minutes=habit.duration_minutes)
-            
-            try:
-                check_habit_conflicts(user_id, start_time, end_time, db)
-            except ValueError as e:
-                raise ValueError(f"تعارض في {current_date}: {str(e)}")
-            
-            event = CalendarEvent(
-                user_id=user_id,
-                habit_id=habit.id,
-                event_type='habit',
-                start_time=start_time,
-                end_time=end_time
+
+# Each factory pre-extracts the slot dicts into plain locals once, then
+# returns the window iterator used by _generate_events_windowed. Slots become
+# offsets from midnight so the hot loops stride a single running datetime
+# instead of allocating a fresh date plus datetime.combine per occurrence.
+
+def _daily_occurrences(slots, duration):
+    """Occurrence iterator factory for daily habits."""
+    slot_offsets = [timedelta(hours=slot['hour'], minutes=slot['minute'])
+                    for slot in slots]
+
+    def occurrences_in(window_start, window_end):
+        num_days = (window_end - window_start).days + 1
+        midnight = datetime.combine(window_start, time.min)
+        for offset in slot_offsets:
+            start_time = midnight + offset
+            for _ in range(num_days):
+                yield start_time, start_time + duration
+                start_time += _ONE_DAY
+
+    return occurrences_in
+
+
+def _weekly_occurrences(slots, duration):
+    """Occurrence iterator factory for weekly habits."""
+    slot_specs = [
+        ((slot['day'] - 1) % 7,  # Adjust for Sunday=0
+         timedelta(hours=slot['hour'], minutes=slot['minute']))
+        for slot in slots
+    ]
+
+    def occurrences_in(window_start, window_end):
+        window_cutoff = datetime.combine(window_end, time.max)
+        for target_weekday, offset in slot_specs:
+            # Jump straight to the first matching weekday, then stride 7 days
+            first_date = window_start + timedelta(
+                days=(target_weekday - window_start.weekday()) % 7
             )
-            db.add(event)
-        
-        current_date += timedelta(days=1)
-    
-    db.commit()
+            start_time = datetime.combine(first_date, time.min) + offset
+            while start_time <= window_cutoff:
+                yield start_time, start_time + duration
+                start_time += _ONE_WEEK
+
+    return occurrences_in
+
+
+def _monthly_occurrences(slots, duration):
+    """Occurrence iterator factory for monthly habits."""
+    slot_specs = [(slot['day'], time(slot['hour'], slot['minute'])) for slot in slots]
+
+    def occurrences_in(window_start, window_end):
+        for slot_day, slot_time in slot_specs:
+            # Step month by month instead of scanning every day of the window
+            year, month = window_start.year, window_start.month
+            while (year, month) <= (window_end.year, window_end.month):
+                # Skip months too short for this slot (e.g. day 31 in February)
+                if slot_day <= monthrange(year, month)[1]:
+                    current_date = date(year, month, slot_day)
+                    if window_start <= current_date <= window_end:
+                        start_time = datetime.combine(current_date, slot_time)
+                        yield start_time, start_time + duration
+
+                month += 1
+                if month > 12:
+                    month = 1
+                    year += 1
+
+    return occurrences_in
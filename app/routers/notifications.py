@@ -3,10 +3,10 @@ from datetime import datetime, timedelta
 from typing import List
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only, selectinload
 
 from app.database import get_db
-from app.models import CalendarEvent
+from app.models import CalendarEvent, Task
 
 router = APIRouter(
     prefix="/notifications",
@@ -28,6 +28,10 @@ async def check_upcoming_tasks(db: Session):
         CalendarEvent.start_time >= target_time_start,
         CalendarEvent.start_time <= target_time_end,
         CalendarEvent.notification_sent == False
+    ).options(
+        # event.task.title is read per event below; batch-load the titles
+        # instead of triggering one lazy SELECT per row
+        selectinload(CalendarEvent.task).load_only(Task.title),
     ).all()
     
     notifications = []
@@ -40,14 +44,18 @@ async def check_upcoming_tasks(db: Session):
             "start_time": event.start_time,
             "message": f"مهمة قادمة: {event.task.title} بعد 30 دقيقة"
         }
-        
+
         notifications.append(notification_data)
-        
-        # Mark notification as sent
-        event.notification_sent = True
-    
+
+    # Mark all notifications as sent in one UPDATE ... WHERE id IN (...)
+    # instead of dirtying each ORM instance (N separate UPDATEs on commit)
+    if upcoming_events:
+        db.query(CalendarEvent).filter(
+            CalendarEvent.id.in_([event.id for event in upcoming_events])
+        ).update({"notification_sent": True}, synchronize_session=False)
+
     db.commit()
-    
+
     return notifications
 
 
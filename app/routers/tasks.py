@@ -3,18 +3,24 @@ from datetime import datetime, timedelta
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
 from app import crud
 from app.dependencies import get_current_user, get_db
 from app.models import User
 from app.schemas import (TaskBase, TaskCreate, TaskRead, TaskTimerAction, TaskUpdate)
+from app.utils.ttl_cache import MISSING, TTLCache
 
 router = APIRouter(
     prefix="/tasks",
     tags=["Tasks"],
 )
 
+# /tasks/active is polled by mobile clients; serve repeats from memory for a
+# few seconds and let the mutation endpoints below invalidate explicitly
+_active_task_cache = TTLCache(ttl_seconds=5.0)
+
 @router.get(
     "/active/", response_model=Optional[TaskRead], status_code=status.HTTP_200_OK
 )
@@ -25,8 +31,14 @@ def get_active_task_endpoint(
     GET /tasks/active
     جلب المهمة النشطة حالياً. يعيد null إذا لم يتم العثور على مهمة نشطة.
     """
+    cached = _active_task_cache.get(current_user.id)
+    if cached is not MISSING:
+        return cached
+
     active_task = crud.get_active_task(db, user_id=current_user.id)
-    return active_task  # Returns None if no active task
+    payload = TaskRead.from_orm_fast(active_task).model_dump() if active_task else None
+    _active_task_cache.set(current_user.id, payload)
+    return payload  # Returns None if no active task
 
 
 @router.post("/{task_id}/start_timer", response_model=TaskRead)
@@ -48,6 +60,7 @@ def start_task_timer_endpoint(
         raise HTTPException(
             status_code=400, detail=task["error"]
         )  # لخطأ "مهمة أخرى نشطة"
+    _active_task_cache.invalidate(current_user.id)
     return task
 
 
@@ -66,6 +79,7 @@ def stop_task_timer_endpoint(
         raise HTTPException(
             status_code=404, detail="Active task not found or already stopped."
         )
+    _active_task_cache.invalidate(current_user.id)
     return task
 
 
@@ -90,6 +104,7 @@ def complete_task_endpoint(
         raise HTTPException(
             status_code=404, detail="Task not found or unable to complete."
         )
+    _active_task_cache.invalidate(current_user.id)
     return task
 
 
@@ -113,6 +128,7 @@ def mark_task_incomplete_endpoint(
         raise HTTPException(
             status_code=404, detail="Task not found or unable to mark incomplete."
         )
+    _active_task_cache.invalidate(current_user.id)
     return task
 
 
@@ -123,10 +139,11 @@ def create_task_for_user(
     current_user: User = Depends(get_current_user),
 ):
     # يجب أن تكون هذه الدالة موجودة في crud.py
+    _active_task_cache.invalidate(current_user.id)
     return crud.create_user_task(db=db, task=task, user_id=current_user.id)
 
 
-@router.get("/", response_model=List[TaskRead])
+@router.get("/", response_class=ORJSONResponse)
 def read_tasks(
     skip: int = 0,
     limit: int = 100,
@@ -134,7 +151,30 @@ def read_tasks(
     current_user: User = Depends(get_current_user),
 ):
     tasks = crud.get_tasks(db, user_id=current_user.id, skip=skip, limit=limit)
-    return tasks
+    # Build the TaskRead shape by hand and hand it to orjson directly; the
+    # double Pydantic validation + jsonable_encoder pass was the dominant
+    # cost of this list endpoint
+    return ORJSONResponse([
+        {
+            "id": t.id,
+            "owner_id": t.owner_id,
+            "title": t.title,
+            "description": t.description,
+            "priority": t.priority,
+            "status": t.status,
+            "due_date": t.due_date,
+            "category": t.category,
+            "completed": t.completed,
+            "estimated_hours": t.estimated_hours,
+            "created_at": t.created_at,
+            "is_active": t.is_active,
+            "start_time": t.start_time,
+            "remaining_time_seconds": t.remaining_time_seconds,
+            "time_spent_seconds": t.time_spent_seconds,
+            "initial_duration_seconds": t.initial_duration_seconds,
+        }
+        for t in tasks
+    ])
 
 
 @router.put("/{task_id}", response_model=TaskRead)
@@ -151,6 +191,7 @@ def update_task_data(
         raise HTTPException(status_code=404, detail="Task not found")
     if updated_task == "completed":
         raise HTTPException(status_code=400, detail="Completed tasks cannot be edited.")
+    _active_task_cache.invalidate(current_user.id)
     return updated_task
 
 
@@ -163,4 +204,5 @@ def delete_task_data(
     deleted = crud.delete_task(db, task_id=task_id, user_id=current_user.id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Task not found")
+    _active_task_cache.invalidate(current_user.id)
     return {"ok": True}
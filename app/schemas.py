@@ -4,6 +4,36 @@ from typing import List, Optional, ClassVar
 
 from pydantic import BaseModel, EmailStr, Field
 
+
+class FastBase(BaseModel):
+    """قاعدة لنماذج الاستجابة المبنية من صفوف قاعدة البيانات.
+
+    from_orm_fast skips pydantic-core validation via model_construct; DB rows
+    already satisfy the schema, so response paths shouldn't pay to re-validate
+    every field. Inbound request bodies must keep using model_validate.
+
+    defer_build delays core-schema construction until a subclass is first
+    used, trimming import-time CPU/memory for endpoints that are rarely hit.
+    Don't add it to request bodies validated on every call.
+    """
+    model_config = {
+        "from_attributes": True,
+        "defer_build": True,
+        # Features these models never use; disabling them keeps the generated
+        # core schema smaller and skips the extras/revalidation branches
+        "extra": "ignore",
+        "validate_assignment": False,
+        "revalidate_instances": "never",
+        # Response instances are construct -> dump -> drop; freezing them lets
+        # pydantic skip the mutation machinery per instance
+        "frozen": True,
+    }
+
+    @classmethod
+    def from_orm_fast(cls, obj):
+        return cls.model_construct(**{f: getattr(obj, f) for f in cls.model_fields})
+
+
 # --- نماذج المصادقة (Auth) ---
 
 
@@ -17,7 +47,7 @@ class UserCreate(UserBase):
     password: str 
     
 
-class UserRead(UserBase):
+class UserRead(UserBase, FastBase):
     id: int
     is_active: bool
     is_verified: bool
@@ -27,13 +57,9 @@ class UserRead(UserBase):
     subscription_id: Optional[str] = None
     expires_at: Optional[datetime] = None
     is_premium: bool = False  
-    premium_plan: Optional[str] = None 
+    premium_plan: Optional[str] = None
     created_at: datetime
 
-    model_config = {
-        "from_attributes": True
-    }
-
 
 
 class SubscriptionUpdate(BaseModel):
@@ -85,7 +111,7 @@ class CalendarEventUpdate(BaseModel):
     completed: Optional[bool] = None
 
 
-class CalendarEventResponse(BaseModel):
+class CalendarEventResponse(FastBase):
     event_id: str
     start_datetime: datetime
     end_datetime: datetime
@@ -137,7 +163,7 @@ class TaskUpdate(TaskBase):
     estimated_hours: Optional[float] = None
 
 
-class TaskRead(TaskUpdate):
+class TaskRead(TaskUpdate, FastBase):
     id: int
     owner_id: int
     created_at: datetime
@@ -146,9 +172,6 @@ class TaskRead(TaskUpdate):
     time_spent_seconds: int
     start_time: Optional[datetime] = None
     initial_duration_seconds: int
-    model_config = {
-        "from_attributes": True
-    }
 
 
 class TaskTimerAction(BaseModel):
@@ -172,13 +195,10 @@ class NoteUpdate(NoteBase):
     is_starred: Optional[bool] = None
 
 
-class NoteRead(NoteBase):
+class NoteRead(NoteBase, FastBase):
     id: int
     owner_id: int
     created_at: datetime
-    model_config = {
-        "from_attributes": True
-    }
 
 
 # --- نماذج الأصدقاء (Friends) ---
@@ -191,221 +211,36 @@ class FriendshipBase(BaseModel):
 class FriendshipCreate(BaseModel):
     friend_id: int # The ID of the user to send a request to
 
-class FriendshipRead(FriendshipBase):
+class FriendshipRead(FriendshipBase, FastBase):
     id: int
     created_at: datetime
     updated_at: datetime
 
-    model_config = {
-        "from_attributes": True
-    }
-
-class FriendRequest(BaseModel):
+class FriendRequest(FastBase):
     id: int
     sender_id: int
     sender_name: str
     created_at: datetime
 
-    model_config = {
-        "from_attributes": True
-    }
-
-class Friend(BaseModel):
+class Friend(FastBase):
     id: int
     name: str
     email: EmailStr
 
-    model_config = {
-        "from_attributes": True
-    }
-
-class SubscriptionUpdate(BaseModel):
-    plan: str
-    is_premium: Optional[bool] = None
-    subscription_id: Optional[str] = None
-    expires_at: Optional[datetime] = None
-
-
-class ActivationCodeRequest(BaseModel):
-    code: str
-
-
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-
-
-class TokenData(BaseModel):
-    email: Optional[str] = None
-    id: Optional[int] = None
-
-
-class PasswordChange(BaseModel):
-    old_password: str
-    new_password: str
-
-
-class FirebaseTokenRequest(BaseModel):
-    id_token: str
-
-
-class GoogleTokenRequest(BaseModel):
-    access_token: str
-    refresh_token: Optional[str] = None
-    expires_in: Optional[int] = None
-
-
-class CalendarStatusResponse(BaseModel):
-    is_linked: bool
-    email: Optional[str] = None
-
-
-class CalendarEventRequest(BaseModel):
-    start_time: str  # HH:MM format
-
-
-class CalendarEventUpdate(BaseModel):
-    completed: Optional[bool] = None
-
-
-class CalendarEventResponse(BaseModel):
-    event_id: str
-    start_datetime: datetime
-    end_datetime: datetime
-
-
-class ResetPasswordSchema(BaseModel):
-    token: str
-    new_password: str
-
-class ForgotPasswordRequest(BaseModel):
-    email: EmailStr
-
-class VerifyEmailRequest(BaseModel):
-    email: EmailStr
-    code: str
-
-class VerifyResetCode(BaseModel):
-    email: EmailStr
-    code: str
-
-class ResetPasswordConfirm(BaseModel):
-    email: EmailStr
-    code: str
-    new_password: str
-
-
-class TaskBase(BaseModel):
-    title: str
-    description: Optional[str] = None
-    priority: str = "متوسطة"
-    due_date: Optional[datetime] = None
-    category: str = "عام"
-    estimated_hours: float = 1.0
-
-
-class TaskCreate(TaskBase):
-    pass
-
-
-class TaskUpdate(TaskBase):
-    status: str = "لم تبدأ"
-    completed: bool = False
-
-    title: Optional[str] = None
-    description: Optional[str] = None
-    priority: Optional[str] = None
-    due_date: Optional[datetime] = None
-    category: Optional[str] = None
-    estimated_hours: Optional[float] = None
-
-
-class TaskRead(TaskUpdate):
-    id: int
-    owner_id: int
-    created_at: datetime
-    is_active: bool
-    remaining_time_seconds: int
-    time_spent_seconds: int
-    start_time: Optional[datetime] = None
-    initial_duration_seconds: int
-    model_config = {
-        "from_attributes": True
-    }
-
-
-class TaskTimerAction(BaseModel):
-    progress_details: Optional[str] = None
-
-
-class NoteBase(BaseModel):
-    title: str = "ملاحظة جديدة"
-    content: str = ""
-    category: str = "أفكار"
-    is_starred: bool = False
-
-class NoteCreate(NoteBase):
-    pass
-
-
-class NoteUpdate(NoteBase):
-    title: Optional[str] = None
-    content: Optional[str] = None
-    category: Optional[str] = None
-    is_starred: Optional[bool] = None
-
-
-class NoteRead(NoteBase):
-    id: int
-    owner_id: int
-    created_at: datetime
-    model_config = {
-        "from_attributes": True
-    }
-
-
-# --- نماذج الأصدقاء (Friends) ---
-
-class FriendshipBase(BaseModel):
-    user_id: int
-    friend_id: int
-    status: str
-
-class FriendshipCreate(BaseModel):
-    friend_id: int # The ID of the user to send a request to
-
-class FriendshipRead(FriendshipBase):
-    id: int
-    created_at: datetime
-    updated_at: datetime
-
-    model_config = {
-        "from_attributes": True
-    }
-
-class FriendRequest(BaseModel):
-    id: int
-    sender_id: int
-    sender_name: str
-    created_at: datetime
-
-    model_config = {
-        "from_attributes": True
-    }
-
-class Friend(BaseModel):
+class UserSearchRead(FastBase):
     id: int
     name: str
-    email: EmailStr
 
-    model_config = {
-        "from_attributes": True
-    }
 
-class UserSearchRead(BaseModel):
+class FriendProfile(FastBase):
     id: int
     name: str
-
-    model_config = {
-        "from_attributes": True
-    }
+    email: EmailStr
+    created_at: datetime
+    total_tasks: int
+    completed_tasks: int
+    total_challenges: int
+    challenges_won: int
+    gold_trophies: int = 0
+    silver_trophies: int = 0
+    bronze_trophies: int = 0
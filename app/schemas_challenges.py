@@ -1,17 +1,16 @@
 from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
+
+from .schemas import FastBase
 
 # --- Question Schemas ---
 class QuestionOptionCreate(BaseModel):
     text: str
     is_correct: bool = False
 
-class QuestionOptionResponse(QuestionOptionCreate):
+class QuestionOptionResponse(QuestionOptionCreate, FastBase):
     id: int
-    
-    class Config:
-        from_attributes = True
 
 class QuestionCreate(BaseModel):
     text: str
@@ -19,28 +18,22 @@ class QuestionCreate(BaseModel):
     explanation: Optional[str] = None
     options: List[QuestionOptionCreate]
 
-class QuestionResponse(QuestionCreate):
+class QuestionResponse(QuestionCreate, FastBase):
     id: int
     options: List[QuestionOptionResponse]
 
-    class Config:
-        from_attributes = True
-
 # --- Quiz Schemas ---
 class QuizCreate(BaseModel):
     duration_minutes: int
     questions: List[QuestionCreate]
 
-class QuizResponse(BaseModel):
+class QuizResponse(FastBase):
     id: int
     duration_minutes: int
     questions: List[QuestionResponse]
 
-    class Config:
-        from_attributes = True
-
 # --- Participant Schemas ---
-class ParticipantResponse(BaseModel):
+class ParticipantResponse(FastBase):
     id: int
     user_id: int
     status: str
@@ -50,9 +43,6 @@ class ParticipantResponse(BaseModel):
     score: Optional[float] = None
     user_name: Optional[str] = None # Helper to show name
 
-    class Config:
-        from_attributes = True
-
 # --- Challenge Schemas ---
 class ChallengeCreate(BaseModel):
     name: str
@@ -63,7 +53,7 @@ class ChallengeCreate(BaseModel):
     invited_friend_ids: List[int]
     quiz_data: Optional[QuizCreate] = None # Required if is_quiz is True
 
-class ChallengeResponse(BaseModel):
+class ChallengeResponse(FastBase):
     id: int
     creator_id: int
     name: str
@@ -76,10 +66,7 @@ class ChallengeResponse(BaseModel):
     participants: List[ParticipantResponse]
     quiz: Optional[QuizResponse] = None
 
-    class Config:
-        from_attributes = True
-
-class ChallengeListResponse(BaseModel):
+class ChallengeListResponse(FastBase):
     id: int
     name: str
     status: str # 'active', 'expired', 'completed'
@@ -88,9 +75,6 @@ class ChallengeListResponse(BaseModel):
     expires_at: datetime
     my_status: Optional[str] # 'invited', 'accepted', 'completed'
 
-    class Config:
-        from_attributes = True
-
 # --- Submission Schemas ---
 class AnswerSubmission(BaseModel):
     question_id: int
@@ -98,3 +82,8 @@ class AnswerSubmission(BaseModel):
 
 class ChallengeSubmission(BaseModel):
     answers: List[AnswerSubmission] = []
+
+
+# Precompiled validator for the answers list on the finish endpoint; validating
+# the list directly skips the ChallengeSubmission wrapper's core-schema layer
+ANSWERS_ADAPTER = TypeAdapter(List[AnswerSubmission])
@@ -1,11 +1,47 @@
 # App utilities
-import random
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+# Fixed keys for the Feistel rounds in _permute_id; changing them would remap
+# future IDs but never collide with past ones (the permutation stays bijective)
+_FEISTEL_KEYS = (0x1B873593, 0x0CC9E2D5, 0x38B34AE5)
+_HALF_BITS = 25
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ID_BASE = 100_000_000_000_000
+_ID_SPAN = 900_000_000_000_000  # 15-digit IDs: base + [0, span)
+
+
+def _permute_id(n: int) -> int:
+    """Bijectively scramble a sequence value inside [0, _ID_SPAN).
+
+    A 50-bit Feistel network with cycle-walking: pure integer arithmetic, no
+    DB round trip, and collision-free by construction, so sequential nextval()
+    values come out looking random instead of guessable.
+    """
+    while True:
+        left, right = n >> _HALF_BITS, n & _HALF_MASK
+        for key in _FEISTEL_KEYS:
+            left, right = right, left ^ ((right * 0x9E3779B1 + key) & _HALF_MASK)
+        n = (left << _HALF_BITS) | right
+        if n < _ID_SPAN:
+            return n
+
+
 def generate_unique_id(db: Session) -> int:
-    """Generate a unique 15-digit ID for a user."""
+    """Allocate a unique 15-digit ID for a user from a DB sequence.
+
+    The old implementation sampled random 15-digit numbers and probed the
+    users table until one was free — a round trip per collision, with the
+    collision rate growing with the table. nextval() is monotonic and
+    collision-free by construction, and the Feistel permutation hides the
+    allocation order so IDs stay non-guessable. The single EXISTS guard only
+    protects against the rare case where we land on a legacy random ID.
+    """
     from .. import models  # Import inside function to avoid circular imports
     while True:
-        new_id = random.randint(100000000000000, 999999999999999)
-        if not db.query(models.User).filter(models.User.id == new_id).first():
+        seq = db.execute(text("SELECT nextval('user_id_seq')")).scalar()
+        new_id = _ID_BASE + _permute_id(seq % _ID_SPAN)
+        if not db.query(
+            db.query(models.User).filter(models.User.id == new_id).exists()
+        ).scalar():
             return new_id
@@ -1,108 +1,163 @@
-from datetime import datetime
-from sqlalchemy.orm import Session
-from ..models import User
-from ..models.challenges import Challenge, ChallengeParticipant
-from ..database import SessionLocal
-
-def process_expired_challenges():
-    db = SessionLocal()
-    try:
-        now = datetime.utcnow()
-        # Find expired challenges
-        expired_challenges = db.query(Challenge).filter(Challenge.expires_at <= now).all()
-        
-        for challenge in expired_challenges:
-            # Check if all ACCEPTED participants have finished
-            # If someone accepted but hasn't started/finished, we might need to wait or force finish?
-            # Requirement: "results saved until everyone finishes"
-            # But also "after lifespan ends... delete".
-            # Let's assume "everyone finishes" means everyone who STARTED.
-            # If they haven't started by expiration, they missed out.
-            
-            participants = challenge.participants
-            all_finished = True
-            active_participants = []
-            
-            for p in participants:
-                if p.status == "accepted":
-                    if p.start_time and not p.end_time:
-                        # Still running?
-                        # Check if their personal timer ran out?
-                        # If so, force finish.
-                        time_elapsed = (now - p.start_time).total_seconds()
-                        max_duration = challenge.duration_minutes * 60
-                        if challenge.is_quiz and challenge.quiz:
-                             max_duration += (challenge.quiz.duration_minutes * 60)
-                        
-                        if time_elapsed > (max_duration + 300): # 5 min buffer
-                             # Force finish
-                             p.end_time = now
-                             p.time_taken_seconds = int(time_elapsed)
-                             p.status = "completed"
-                             # Score remains 0 or whatever
-                        else:
-                            all_finished = False
-                    elif not p.start_time:
-                        # Accepted but never started.
-                        # Since challenge expired, they can't start now.
-                        # Treat as "did not participate" or "0 score"?
-                        # Let's ignore them for ranking.
-                        pass
-                
-                if p.status == "completed":
-                    active_participants.append(p)
-
-            if not all_finished:
-                continue # Skip this challenge for now, wait for runners to finish
-
-            # Calculate Winners
-            # Sort by Score (Desc) then Time (Asc)
-            # For non-quiz, Score is None, so just Time (Asc)
-            
-            if challenge.is_quiz:
-                sorted_participants = sorted(
-                    active_participants, 
-                    key=lambda p: (-1 * (p.score or 0), p.time_taken_seconds or 999999)
-                )
-            else:
-                sorted_participants = sorted(
-                    active_participants, 
-                    key=lambda p: (p.time_taken_seconds or 999999)
-                )
-
-            # Award Cups
-            if sorted_participants:
-                # Gold
-                winner = sorted_participants[0]
-                user = db.query(User).filter(User.id == winner.user_id).first()
-                if user:
-                    user.gold_cups += 1
-                
-                if len(sorted_participants) >= 10:
-                    if len(sorted_participants) > 1:
-                        # Silver
-                        silver = sorted_participants[1]
-                        u2 = db.query(User).filter(User.id == silver.user_id).first()
-                        if u2: u2.silver_cups += 1
-                    
-                    if len(sorted_participants) > 2:
-                        # Bronze
-                        bronze = sorted_participants[2]
-                        u3 = db.query(User).filter(User.id == bronze.user_id).first()
-                        if u3: u3.bronze_cups += 1
-
-            # Increment count for all completed
-            for p in active_participants:
-                u = db.query(User).filter(User.id == p.user_id).first()
-                if u:
-                    u.challenges_count += 1
-
-            # Delete Challenge (Cascade deletes Quiz, Participants, Questions)
-            db.delete(challenge)
-            db.commit()
-            
-    except Exception as e:
-        print(f"Error in process_expired_challenges: {e}")
-        db.rollback()
-    finally:
-        db.close()
+import heapq
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session, load_only, selectinload
+
+from ..models import User
+from ..models.challenges import Challenge, ChallengeParticipant, Quiz
+from ..database import SessionLocal
+
+# Challenges finalized per transaction; keeps each commit (deletes + cup
+# updates) small so locks on the users table are held briefly
+CHALLENGE_BATCH_SIZE = 50
+
+
+def _bulk_increment(db: Session, column, counts: Counter):
+    """Apply per-user increments with one UPDATE per distinct increment.
+
+    counts maps user_id -> how much to add. Users almost always share the
+    same increment (usually 1), so this is typically a single statement
+    instead of one round-trip per user.
+    """
+    by_amount = {}
+    for user_id, amount in counts.items():
+        by_amount.setdefault(amount, []).append(user_id)
+
+    for amount, user_ids in by_amount.items():
+        db.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values({column: column + amount})
+            .execution_options(synchronize_session=False)
+        )
+
+
+def process_expired_challenges():
+    with SessionLocal() as db:
+        try:
+            now = datetime.utcnow()
+            # Float epoch for the elapsed-time checks below: one subtraction
+            # per participant instead of a timedelta allocation
+            now_ts = now.timestamp()
+            # Find expired challenges; eager-load participants and quiz so the
+            # loop below never lazy-loads per challenge
+            # Ranking needs only scalar columns; defer the text payload
+            # (name/description) so hydration moves fewer bytes per challenge
+            expired_challenges = db.query(Challenge).filter(
+                Challenge.expires_at <= now
+            ).options(
+                load_only(
+                    Challenge.id,
+                    Challenge.duration_minutes,
+                    Challenge.is_quiz,
+                    Challenge.expires_at,
+                ),
+                selectinload(Challenge.participants),
+                selectinload(Challenge.quiz).load_only(Quiz.duration_minutes),
+            ).all()
+
+            # Read snapshot above, then write in small batches: each slice of
+            # challenges gets its own counters, bulk UPDATEs and commit, so a
+            # long backlog never accumulates into one giant transaction
+            for batch_start in range(0, len(expired_challenges), CHALLENGE_BATCH_SIZE):
+                batch = expired_challenges[batch_start:batch_start + CHALLENGE_BATCH_SIZE]
+
+                # Cup/count increments collected across the batch and flushed
+                # as bulk UPDATEs instead of one SELECT+dirty per user per
+                # challenge
+                gold = Counter()
+                silver = Counter()
+                bronze = Counter()
+                completed_counts = Counter()
+
+                for challenge in batch:
+                    # Check if all ACCEPTED participants have finished
+                    # If someone accepted but hasn't started/finished, we might need to wait or force finish?
+                    # Requirement: "results saved until everyone finishes"
+                    # But also "after lifespan ends... delete".
+                    # Let's assume "everyone finishes" means everyone who STARTED.
+                    # If they haven't started by expiration, they missed out.
+
+                    participants = challenge.participants
+                    all_finished = True
+                    active_participants = []
+
+                    for p in participants:
+                        if p.status == "accepted":
+                            if p.start_time and not p.end_time:
+                                # Still running?
+                                # Check if their personal timer ran out?
+                                # If so, force finish.
+                                time_elapsed = now_ts - p.start_time.timestamp()
+                                max_duration = challenge.duration_minutes * 60
+                                if challenge.is_quiz and challenge.quiz:
+                                     max_duration += (challenge.quiz.duration_minutes * 60)
+
+                                if time_elapsed > (max_duration + 300): # 5 min buffer
+                                     # Force finish
+                                     p.end_time = now
+                                     p.time_taken_seconds = int(time_elapsed)
+                                     p.status = "completed"
+                                     # Score remains 0 or whatever
+                                else:
+                                    all_finished = False
+                            elif not p.start_time:
+                                # Accepted but never started.
+                                # Since challenge expired, they can't start now.
+                                # Treat as "did not participate" or "0 score"?
+                                # Let's ignore them for ranking.
+                                pass
+
+                        if p.status == "completed":
+                            active_participants.append(p)
+
+                    if not all_finished:
+                        continue # Skip this challenge for now, wait for runners to finish
+
+                    # Calculate Winners
+                    # Rank by Score (Desc) then Time (Asc)
+                    # For non-quiz, Score is None, so just Time (Asc)
+                    # Only the podium matters, so take the top 3 in O(n) instead
+                    # of fully sorting the participant list
+
+                    if challenge.is_quiz:
+                        rank_key = lambda p: (-1 * (p.score or 0), p.time_taken_seconds or 999999)
+                    else:
+                        rank_key = lambda p: (p.time_taken_seconds or 999999)
+
+                    top = heapq.nsmallest(3, active_participants, key=rank_key)
+
+                    # Award Cups
+                    if top:
+                        # Gold
+                        gold[top[0].user_id] += 1
+
+                        if len(active_participants) >= 10:
+                            if len(top) > 1:
+                                # Silver
+                                silver[top[1].user_id] += 1
+
+                            if len(top) > 2:
+                                # Bronze
+                                bronze[top[2].user_id] += 1
+
+                    # Increment count for all completed
+                    for p in active_participants:
+                        completed_counts[p.user_id] += 1
+
+                    # Delete Challenge (ORM cascade deletes Quiz, Participants, Questions)
+                    db.delete(challenge)
+
+                _bulk_increment(db, User.gold_cups, gold)
+                _bulk_increment(db, User.silver_cups, silver)
+                _bulk_increment(db, User.bronze_cups, bronze)
+                _bulk_increment(db, User.challenges_count, completed_counts)
+
+                # Commit this batch before moving to the next slice
+                db.commit()
+
+        except Exception as e:
+            print(f"Error in process_expired_challenges: {e}")
+            db.rollback()
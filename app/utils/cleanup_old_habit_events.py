@@ -3,28 +3,45 @@ Background job to cleanup old habit calendar events.
 Runs daily to remove events that have passed.
 """
 from datetime import datetime, date
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 from app.models import CalendarEvent
 from app.database import SessionLocal
 
+# Rows deleted per transaction; bounds lock hold time and WAL volume when the
+# backlog is large (e.g. after the job hasn't run for a while)
+CLEANUP_CHUNK_SIZE = 5000
+
 
 def cleanup_old_habit_events():
-    """Delete calendar events for habits that are in the past"""
+    """Delete calendar events for habits that are in the past, in chunks"""
     db = SessionLocal()
     try:
         today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Delete habit events before today
-        deleted_count = db.query(CalendarEvent).filter(
-            CalendarEvent.event_type == 'habit',
-            CalendarEvent.start_time < today
-        ).delete(synchronize_session=False)
-        
-        db.commit()
-        
+
+        # Delete habit events before today, CLEANUP_CHUNK_SIZE rows per
+        # transaction so a big backlog never holds row locks for the whole run
+        deleted_count = 0
+        while True:
+            batch = select(CalendarEvent.id).where(
+                CalendarEvent.event_type == 'habit',
+                CalendarEvent.start_time < today
+            ).limit(CLEANUP_CHUNK_SIZE).scalar_subquery()
+
+            result = db.execute(
+                delete(CalendarEvent)
+                .where(CalendarEvent.id.in_(batch))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+
+            deleted_count += result.rowcount
+            if result.rowcount < CLEANUP_CHUNK_SIZE:
+                break
+
         print(f"✅ Cleanup completed: {deleted_count} old habit events deleted")
         return deleted_count
-        
+
     except Exception as e:
         db.rollback()
         print(f"❌ Error during cleanup: {e}")
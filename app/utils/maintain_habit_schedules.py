@@ -2,7 +2,9 @@
 Background job to maintain rolling schedules for permanent habits.
 Ensures permanent habits always have events scheduled for the appropriate future period.
 """
+from calendar import monthrange
 from datetime import datetime, date, time, timedelta
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from app.models import Habit, CalendarEvent
 from app.database import SessionLocal
@@ -28,17 +30,19 @@ def maintain_habit_schedules():
             Habit.is_permanent == True,
             Habit.is_active == True
         ).all()
-        
+
         total_added = 0
-        
+
         for habit in permanent_habits:
             added = _extend_habit_schedule(habit, db)
+            # One transaction per habit keeps lock-held time to a single
+            # bulk insert instead of the whole nightly run
+            db.commit()
             total_added += added
-        
-        db.commit()
+
         print(f"✅ Schedule maintenance completed: {total_added} new events added across {len(permanent_habits)} habits")
         return total_added
-        
+
     except Exception as e:
         db.rollback()
         print(f"❌ Error during schedule maintenance: {e}")
@@ -51,139 +55,142 @@ def _extend_habit_schedule(habit: Habit, db: Session) -> int:
     """Extend schedule for a single habit if needed"""
     schedule_days = get_schedule_period(habit.frequency)
     target_end_date = date.today() + timedelta(days=schedule_days)
-    
+
     # Get the last scheduled event for this habit
     last_event = db.query(CalendarEvent).filter(
         CalendarEvent.habit_id == habit.id
     ).order_by(CalendarEvent.start_time.desc()).first()
-    
+
     if not last_event:
         # No events exist, generate from scratch
         print(f"  Habit {habit.id} ({habit.name}): No events found, skipping maintenance")
         return 0
-    
+
     last_event_date = last_event.start_time.date()
-    
+
     # If we still have enough future events, skip
     if last_event_date >= target_end_date:
         return 0
-    
-    # Generate missing events
-    added_count = 0
-    current_date = last_event_date + timedelta(days=1)
-    
-    while current_date <= target_end_date:
-        if habit.frequency == 'daily':
-            added_count += _add_daily_events(habit, current_date, db)
-        elif habit.frequency == 'weekly':
-            added_count += _add_weekly_events(habit, current_date, db)
-        elif habit.frequency == 'monthly':
-            added_count += _add_monthly_events(habit, current_date, db)
-        
-        current_date += timedelta(days=1)
-    
-    if added_count > 0:
-        print(f"  Habit {habit.id} ({habit.name}): Added {added_count} new events")
-    
-    return added_count
-
-
-def _add_daily_events(habit: Habit, current_date: date, db: Session) -> int:
-    """Add daily events for a specific date"""
-    if not habit.daily_times:
-        return 0
-    
-    added = 0
-    for time_slot in habit.daily_times:
-        start_time = datetime.combine(current_date, time(time_slot['hour'], time_slot['minute']))
-        end_time = start_time + timedelta(minutes=habit.duration_minutes)
-        
-        # Check if event already exists (avoid duplicates)
-        existing = db.query(CalendarEvent).filter(
-            CalendarEvent.habit_id == habit.id,
-            CalendarEvent.start_time == start_time
-        ).first()
-        
-        if not existing:
-            event = CalendarEvent(
-                user_id=habit.user_id,
-                habit_id=habit.id,
-                event_type='habit',
-                start_time=start_time,
-                end_time=end_time
-            )
-            db.add(event)
-            added += 1
-    
-    return added
 
+    # Compute every candidate start time in Python first, then hand them all
+    # to the DB in one INSERT; the unique (habit_id, start_time) index plus
+    # ON CONFLICT DO NOTHING replaces any existence probing
+    start_date = last_event_date + timedelta(days=1)
 
-def _add_weekly_events(habit: Habit, current_date: date, db: Session) -> int:
-    """Add weekly events for a specific date"""
-    if not habit.weekly_times:
+    # Read each JSON slot column exactly once and flatten to plain int tuples;
+    # the helpers then never touch the instrumented attribute again
+    if habit.frequency == 'daily':
+        slots = tuple((s['hour'], s['minute']) for s in habit.daily_times or ())
+        candidates = _daily_start_times(slots, start_date, target_end_date)
+    elif habit.frequency == 'weekly':
+        slots = tuple(
+            ((s['day'] - 1) % 7, s['hour'], s['minute'])  # Adjust for Sunday=0
+            for s in habit.weekly_times or ()
+        )
+        candidates = _weekly_start_times(slots, start_date, target_end_date)
+    elif habit.frequency == 'monthly':
+        slots = tuple((s['day'], s['hour'], s['minute']) for s in habit.monthly_times or ())
+        candidates = _monthly_start_times(slots, start_date, target_end_date)
+    else:
         return 0
-    
-    added = 0
-    for time_slot in habit.weekly_times:
-        # Check if current_date matches the day of week
-        if current_date.weekday() != (time_slot['day'] - 1) % 7:
-            continue
-        
-        start_time = datetime.combine(current_date, time(time_slot['hour'], time_slot['minute']))
-        end_time = start_time + timedelta(minutes=habit.duration_minutes)
-        
-        existing = db.query(CalendarEvent).filter(
-            CalendarEvent.habit_id == habit.id,
-            CalendarEvent.start_time == start_time
-        ).first()
-        
-        if not existing:
-            event = CalendarEvent(
-                user_id=habit.user_id,
-                habit_id=habit.id,
-                event_type='habit',
-                start_time=start_time,
-                end_time=end_time
-            )
-            db.add(event)
-            added += 1
-    
-    return added
-
 
-def _add_monthly_events(habit: Habit, current_date: date, db: Session) -> int:
-    """Add monthly events for a specific date"""
-    if not habit.monthly_times:
+    if not candidates:
         return 0
-    
-    added = 0
-    for time_slot in habit.monthly_times:
-        # Check if current_date matches the day of month
-        if current_date.day != time_slot['day']:
-            continue
-        
-        start_time = datetime.combine(current_date, time(time_slot['hour'], time_slot['minute']))
-        end_time = start_time + timedelta(minutes=habit.duration_minutes)
-        
-        existing = db.query(CalendarEvent).filter(
-            CalendarEvent.habit_id == habit.id,
-            CalendarEvent.start_time == start_time
-        ).first()
-        
-        if not existing:
-            event = CalendarEvent(
-                user_id=habit.user_id,
-                habit_id=habit.id,
-                event_type='habit',
-                start_time=start_time,
-                end_time=end_time
-            )
-            db.add(event)
-            added += 1
-    
+
+    # Hoist the per-row constants; instrumented ORM attribute access inside
+    # the comprehension would otherwise run once per candidate
+    user_id = habit.user_id
+    habit_id = habit.id
+    duration_minutes = habit.duration_minutes
+    duration = timedelta(minutes=duration_minutes)
+    rows = [
+        {
+            'user_id': user_id,
+            'habit_id': habit_id,
+            'event_type': 'habit',
+            'start_time': start_time,
+            'end_time': start_time + duration,
+            'duration_minutes': duration_minutes,
+        }
+        for start_time in candidates
+    ]
+
+    result = db.execute(
+        pg_insert(CalendarEvent)
+        .on_conflict_do_nothing(index_elements=['habit_id', 'start_time']),
+        rows,
+    )
+    added = result.rowcount if result.rowcount and result.rowcount > 0 else 0
+
+    if added:
+        print(f"  Habit {habit.id} ({habit.name}): Added {added} new events")
+
     return added
 
 
+def _daily_start_times(slots: tuple, start_date: date, end_date: date) -> list:
+    """All daily-slot start times between start_date and end_date inclusive"""
+    starts = []
+    day = timedelta(days=1)
+    num_days = (end_date - start_date).days + 1
+    midnight = datetime.combine(start_date, time.min)
+    for hour, minute in slots:
+        # Stride one running datetime instead of allocating a date plus a
+        # datetime.combine for every day of the window
+        current = midnight + timedelta(hours=hour, minutes=minute)
+        for _ in range(num_days):
+            starts.append(current)
+            current += day
+
+    return starts
+
+
+def _weekly_start_times(slots: tuple, start_date: date, end_date: date) -> list:
+    """All weekly-slot start times between start_date and end_date inclusive"""
+    starts = []
+    week = timedelta(days=7)
+    cutoff = datetime.combine(end_date, time.max)
+    for target_weekday, hour, minute in slots:
+        # Jump straight to the first matching weekday, then stride by 7 days
+        # instead of testing all ~365 days per slot
+        first_date = start_date + timedelta(
+            days=(target_weekday - start_date.weekday()) % 7
+        )
+        current = datetime.combine(first_date, time.min) + timedelta(
+            hours=hour, minutes=minute
+        )
+        while current <= cutoff:
+            starts.append(current)
+            current += week
+
+    return starts
+
+
+def _monthly_start_times(slots: tuple, start_date: date, end_date: date) -> list:
+    """All monthly-slot start times between start_date and end_date inclusive"""
+    starts = []
+    for target_day, hour, minute in slots:
+        slot_time = time(hour, minute)
+        # Step month by month instead of day by day; months too short for the
+        # slot (e.g. day 31 in February) simply don't get an occurrence
+        year, month = start_date.year, start_date.month
+        while True:
+            if target_day <= monthrange(year, month)[1]:
+                occurrence = date(year, month, target_day)
+                if occurrence > end_date:
+                    break
+                if occurrence >= start_date:
+                    starts.append(datetime.combine(occurrence, slot_time))
+            elif date(year, month, 1) > end_date:
+                break
+            if month == 12:
+                year, month = year + 1, 1
+            else:
+                month += 1
+
+    return starts
+
+
 if __name__ == "__main__":
     # For manual testing
     maintain_habit_schedules()
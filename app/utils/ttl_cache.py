@@ -0,0 +1,39 @@
+"""
+Tiny in-process TTL cache for idempotent, per-user GET endpoints.
+
+Mobile clients poll endpoints like /tasks/active every few seconds; within
+that window the data only changes through our own mutation endpoints, so a
+short-lived cache elides the DB query entirely while the mutators invalidate
+their user's entry explicitly.
+"""
+import time
+
+# Sentinel so callers can distinguish "cached None" from "no cache entry"
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds: float = 5.0, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+
+    def get(self, key, default=MISSING):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            self._entries.pop(key, None)
+            return default
+        return value
+
+    def set(self, key, value):
+        if len(self._entries) >= self.max_entries:
+            # Drop everything instead of LRU bookkeeping; entries refill
+            # within one TTL and this caps memory deterministically
+            self._entries.clear()
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
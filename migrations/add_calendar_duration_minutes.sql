@@ -0,0 +1,4 @@
+-- Denormalized event duration so conflict checks can filter short events in SQL
+ALTER TABLE calendar_events ADD COLUMN IF NOT EXISTS duration_minutes INTEGER;
+UPDATE calendar_events SET duration_minutes = EXTRACT(EPOCH FROM end_time - start_time) / 60 WHERE duration_minutes IS NULL;
+ALTER TABLE calendar_events ALTER COLUMN duration_minutes SET NOT NULL;
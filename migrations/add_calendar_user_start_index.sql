@@ -0,0 +1,2 @@
+-- Composite index backing the overlap range scans in the calendar/habit conflict checks
+CREATE INDEX IF NOT EXISTS ix_calendar_user_start ON calendar_events(user_id, start_time);
@@ -0,0 +1,2 @@
+-- Error message from the background event-generation task, polled via GET /habits/{id}
+ALTER TABLE habits ADD COLUMN IF NOT EXISTS last_generation_error TEXT;
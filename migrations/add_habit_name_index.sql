@@ -0,0 +1,2 @@
+-- Partial composite index backing the duplicate-name check in create_habit
+CREATE INDEX IF NOT EXISTS ix_habit_user_name_active ON habits(user_id, name) WHERE is_active;
@@ -0,0 +1,2 @@
+-- One occurrence per habit per start time; backs ON CONFLICT DO NOTHING in the event generators
+CREATE UNIQUE INDEX IF NOT EXISTS ix_calendar_events_habit_start ON calendar_events(habit_id, start_time);
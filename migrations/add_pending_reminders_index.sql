@@ -0,0 +1,2 @@
+-- Partial index backing the reminder sweep in check_upcoming_tasks (unsent events only)
+CREATE INDEX IF NOT EXISTS ix_cal_pending_reminders ON calendar_events(start_time) WHERE notification_sent = false;
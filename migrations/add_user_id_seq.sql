@@ -0,0 +1,2 @@
+-- Sequence backing generate_unique_id; starts in the 15-digit range used for user IDs
+CREATE SEQUENCE IF NOT EXISTS user_id_seq START 100000000000000;
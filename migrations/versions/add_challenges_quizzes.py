@@ -1,10 +1,54 @@
 """Add challenge and quiz tables
 
 Revision ID: add_challenges_quizzes
-Revises: 
+Revises:
 Create Date: 2025-11-29
 
+Requires PostgreSQL 17+: the partitioned quiz_responses parent declares a
+GENERATED ... AS IDENTITY column, which older servers reject on partitioned
+tables.
+
+Foreign keys are created NOT VALID: new and updated rows are still checked,
+but existing rows are not scanned at creation time, so replaying this
+migration against already-populated tables (e.g. a bulk import) never takes
+a long validation lock. After such a load, validate during a maintenance
+window with, per constraint:
+
+    ALTER TABLE <table> VALIDATE CONSTRAINT <fk_name>;
+
+(names are in FOREIGN_KEYS below). VALIDATE CONSTRAINT takes only a
+SHARE UPDATE EXCLUSIVE lock, so it can run alongside normal traffic.
+
+quiz_responses is range partitioned by created_at (monthly). A scheduled job
+(or pg_partman) must create each upcoming month's partition ahead of time:
+
+    CREATE TABLE quiz_responses_YYYY_MM PARTITION OF quiz_responses
+        FOR VALUES FROM ('YYYY-MM-01') TO ('<first of next month>');
+
+rows for months without a partition land in quiz_responses_default.
+
+challenge_participants is clustered on ix_cp_challenge_rank. CLUSTER takes
+an ACCESS EXCLUSIVE lock and rewrites the table — free here on an empty
+schema, but to re-cluster a populated table later use pg_repack (or a
+maintenance window) rather than running CLUSTER against live traffic.
+
+Setting ALEMBIC_BULK_LOAD=1 in the environment creates every table UNLOGGED,
+skipping WAL writes while fixtures or historical data are replayed. After
+the load, convert each table before relying on it:
+
+    ALTER TABLE <table> SET LOGGED;
+
+(an UNLOGGED table is truncated on crash recovery and not replicated).
+
+Follow-up seed migrations should load rows through _copy_seed below rather
+than per-row INSERTs: it streams one COPY ... FROM STDIN per table, which
+skips SQLAlchemy's per-row parameter binding and is the difference between
+minutes and hours on large fixture sets.
 """
+import csv
+import io
+import os
+
 from alembic import op
 import sqlalchemy as sa
 from sqlalchemy.dialects import postgresql
@@ -16,172 +60,367 @@ branch_labels = None
 depends_on = None
 
 
+# Indexes and foreign keys are created in bulk after all tables exist, so the
+# DDL runs as three clean phases (tables, indexes, constraints) instead of
+# interleaving per table. (name, table, columns, extra kwargs) / (name,
+# source table, referenced table, source columns, referenced columns).
+INDEXES = [
+    ('ix_quizzes_challenge_id', 'quizzes', ['challenge_id'], {}),
+    ('ix_challenges_creator_id', 'challenges', ['creator_id'], {}),
+    ('ix_challenges_challenge_type', 'challenges', ['challenge_type'], {}),
+    # Composite (status, start_time) serves "active challenges starting after
+    # X" in one scan; either column alone is a usable leftmost prefix match
+    # only for status, which is also the hotter single-column filter
+    ('ix_challenges_status_start', 'challenges', ['status', 'start_time'], {}),
+    ('ix_quiz_questions_quiz_id', 'quiz_questions', ['quiz_id'], {}),
+    # Leaderboard reads filter by challenge_id and order by rank/time; the
+    # composite makes them index-only scans instead of heap fetch + sort
+    ('ix_cp_challenge_rank', 'challenge_participants',
+     ['challenge_id', 'rank', 'completion_time_seconds'], {}),
+    ('ix_challenge_participants_user_id', 'challenge_participants', ['user_id'], {}),
+    ('ix_challenge_invitations_challenge_id', 'challenge_invitations', ['challenge_id'], {}),
+    # Only pending invitations are ever looked up by recipient; the partial
+    # index stays small as historical accepted/declined rows accumulate, and
+    # status flips drop the row out of it instead of rewriting an entry
+    ('ix_ci_recipient_pending', 'challenge_invitations', ['recipient_id'],
+     {'postgresql_where': sa.text("status = 'pending'")}),
+    # Two composites instead of three single-column indexes: every insert
+    # updates two indexes, not three, and the real queries ("my recent
+    # responses", "scores in a challenge") become index-only scans. Nothing
+    # filters on quiz_id alone; challenge+user lookups use the challenge_id
+    # prefix of the score index.
+    ('ix_qr_user_submitted', 'quiz_responses', ['user_id', 'submitted_at'], {}),
+    ('ix_qr_challenge_score', 'quiz_responses', ['challenge_id', 'score'], {}),
+    # "How many passed this challenge?" aggregates read only the index
+    ('ix_qr_passed', 'quiz_responses', ['challenge_id', 'passed'], {}),
+    # Per-question analytics ("how many got question X wrong") scan this
+    # instead of JSON-parsing every response row
+    ('ix_qra_question_correct', 'quiz_response_answers', ['question_id', 'is_correct'], {}),
+    # Replaces the FK on response_id (see FOREIGN_KEYS) for per-response
+    # answer lookups and cleanup
+    ('ix_qra_response_id', 'quiz_response_answers', ['response_id'], {}),
+]
+
+FOREIGN_KEYS = [
+    ('fk_quizzes_creator_id', 'quizzes', 'users', ['creator_id'], ['id'], {}),
+    ('fk_challenges_creator_id', 'challenges', 'users', ['creator_id'], ['id'], {}),
+    ('fk_challenges_quiz_id', 'challenges', 'quizzes', ['quiz_id'], ['id'], {}),
+    ('fk_challenges_calendar_event_id', 'challenges', 'calendar_events', ['calendar_event_id'], ['id'], {}),
+    ('fk_quiz_questions_quiz_id', 'quiz_questions', 'quizzes', ['quiz_id'], ['id'], {'ondelete': 'CASCADE'}),
+    ('fk_challenge_participants_challenge_id', 'challenge_participants', 'challenges', ['challenge_id'], ['id'], {'ondelete': 'CASCADE'}),
+    ('fk_challenge_participants_user_id', 'challenge_participants', 'users', ['user_id'], ['id'], {}),
+    ('fk_challenge_invitations_challenge_id', 'challenge_invitations', 'challenges', ['challenge_id'], ['id'], {'ondelete': 'CASCADE'}),
+    ('fk_challenge_invitations_sender_id', 'challenge_invitations', 'users', ['sender_id'], ['id'], {}),
+    ('fk_challenge_invitations_recipient_id', 'challenge_invitations', 'users', ['recipient_id'], ['id'], {}),
+    ('fk_quiz_responses_quiz_id', 'quiz_responses', 'quizzes', ['quiz_id'], ['id'], {'ondelete': 'CASCADE'}),
+    ('fk_quiz_responses_user_id', 'quiz_responses', 'users', ['user_id'], ['id'], {}),
+    ('fk_quiz_responses_challenge_id', 'quiz_responses', 'challenges', ['challenge_id'], ['id'], {'ondelete': 'CASCADE'}),
+    # No FK from quiz_response_answers.response_id: quiz_responses is range
+    # partitioned, and PostgreSQL only allows FKs to a partitioned table when
+    # they reference the full (id, created_at) key. Answer rows are only ever
+    # written/removed alongside their response, so the app maintains the link.
+    ('fk_quiz_response_answers_question_id', 'quiz_response_answers', 'quiz_questions',
+     ['question_id'], ['id'], {}),
+]
+
+
+# Status/type domains as PG enums: a 4-byte OID comparison instead of a
+# collation-aware varchar compare on every status-filtered scan, and the
+# valid values are enforced by the type itself
+ENUMS = [
+    ('challenge_status', ('pending', 'active', 'completed', 'cancelled')),
+    ('participant_status', ('invited', 'accepted', 'declined', 'started', 'completed')),
+    ('invitation_status', ('pending', 'accepted', 'declined')),
+    ('trophy_type', ('gold', 'silver', 'bronze')),
+    ('challenge_type', ('individual', 'group')),
+    ('question_type', ('mcq', 'true_false')),
+]
+
+
+# Opt-in bulk-load mode: see the module docstring. The partitioned
+# quiz_responses parent stores no rows itself, so only its partitions get
+# the UNLOGGED prefix.
+BULK_LOAD = bool(os.environ.get('ALEMBIC_BULK_LOAD'))
+_TABLE_KW = {'prefixes': ['UNLOGGED']} if BULK_LOAD else {}
+_UNLOGGED = 'UNLOGGED ' if BULK_LOAD else ''
+
+
+def _enum(name):
+    """Column type for an already-created enum from ENUMS."""
+    values = dict(ENUMS)[name]
+    return postgresql.ENUM(*values, name=name, create_type=False)
+
+
+def _copy_seed(table, columns, rows):
+    """Bulk-load seed rows with a single COPY instead of per-row INSERTs.
+
+    rows is an iterable of tuples matching columns. Goes through the raw
+    psycopg2 cursor because COPY has no SQLAlchemy expression form; one
+    round trip regardless of row count.
+    """
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cursor = op.get_bind().connection.cursor()
+    cursor.copy_expert(
+        "COPY {} ({}) FROM STDIN CSV".format(table, ", ".join(columns)), buf
+    )
+
+
 def upgrade():
+    # The enum types must exist before any table references them
+    op.execute("; ".join(
+        "CREATE TYPE {} AS ENUM ({})".format(name, ", ".join(f"'{v}'" for v in values))
+        for name, values in ENUMS
+    ))
+
+    # Phase 1: create all tables without foreign keys, so table creation never
+    # waits on constraint validation and the tables can be emitted in any order
+
     # Create quizzes table
     op.create_table('quizzes',
         sa.Column('id', sa.Integer(), nullable=False),
         sa.Column('challenge_id', sa.Integer(), nullable=True),
         sa.Column('creator_id', sa.BigInteger(), nullable=False),
         sa.Column('duration_minutes', sa.Integer(), nullable=False),
-        sa.Column('passing_score', sa.Integer(), nullable=False, server_default='50'),
-        sa.Column('created_at', sa.DateTime(), nullable=True),
-        sa.Column('updated_at', sa.DateTime(), nullable=True),
-        sa.ForeignKeyConstraint(['creator_id'], ['users.id'], ),
-        sa.PrimaryKeyConstraint('id')
+        sa.Column('passing_score', sa.SmallInteger(), nullable=False, server_default='50'),
+        sa.Column('created_at', sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id'),
+        **_TABLE_KW
     )
-    op.create_index(op.f('ix_quizzes_challenge_id'), 'quizzes', ['challenge_id'], unique=False)
-    
-    # Create challenges table
+
+    # Create challenges table. Columns are declared widest-first (8-byte,
+    # then 4-byte, then narrower, then variable-length) so PostgreSQL's
+    # typalign padding between columns disappears and more rows fit per page
     op.create_table('challenges',
         sa.Column('id', sa.Integer(), nullable=False),
         sa.Column('creator_id', sa.BigInteger(), nullable=False),
-        sa.Column('name', sa.String(length=255), nullable=False),
-        sa.Column('description', sa.Text(), nullable=True),
-        sa.Column('challenge_type', sa.String(length=20), nullable=False),
-        sa.Column('duration_minutes', sa.Integer(), nullable=False),
         sa.Column('start_time', sa.DateTime(), nullable=False),
-        sa.Column('has_quiz', sa.Boolean(), nullable=False, server_default='false'),
+        sa.Column('created_at', sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        sa.Column('duration_minutes', sa.Integer(), nullable=False),
         sa.Column('quiz_id', sa.Integer(), nullable=True),
         sa.Column('calendar_event_id', sa.Integer(), nullable=True),
-        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
-        sa.Column('created_at', sa.DateTime(), nullable=True),
-        sa.Column('updated_at', sa.DateTime(), nullable=True),
-        sa.ForeignKeyConstraint(['calendar_event_id'], ['calendar_events.id'], ),
-        sa.ForeignKeyConstraint(['creator_id'], ['users.id'], ),
-        sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ),
-        sa.PrimaryKeyConstraint('id')
+        sa.Column('has_quiz', sa.Boolean(), nullable=False, server_default='false'),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('challenge_type', _enum('challenge_type'), nullable=False),
+        sa.Column('status', _enum('challenge_status'), nullable=False, server_default='pending'),
+        sa.PrimaryKeyConstraint('id'),
+        **_TABLE_KW
     )
-    op.create_index(op.f('ix_challenges_creator_id'), 'challenges', ['creator_id'], unique=False)
-    op.create_index(op.f('ix_challenges_challenge_type'), 'challenges', ['challenge_type'], unique=False)
-    op.create_index(op.f('ix_challenges_start_time'), 'challenges', ['start_time'], unique=False)
-    op.create_index(op.f('ix_challenges_status'), 'challenges', ['status'], unique=False)
-    
+
     # Create quiz_questions table
     op.create_table('quiz_questions',
         sa.Column('id', sa.Integer(), nullable=False),
         sa.Column('quiz_id', sa.Integer(), nullable=False),
         sa.Column('question_text', sa.Text(), nullable=False),
-        sa.Column('question_type', sa.String(length=20), nullable=False),
-        sa.Column('question_order', sa.Integer(), nullable=False),
-        sa.Column('options', sa.JSON(), nullable=True),
-        sa.Column('correct_option_index', sa.Integer(), nullable=True),
+        sa.Column('question_type', _enum('question_type'), nullable=False),
+        sa.Column('question_order', sa.SmallInteger(), nullable=False),
+        # JSONB instead of json: stored pre-parsed binary, so fetching a
+        # question doesn't re-lex the options text on every read
+        sa.Column('options', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('correct_option_index', sa.SmallInteger(), nullable=True),
         sa.Column('correct_answer_boolean', sa.Boolean(), nullable=True),
         sa.Column('explanation', sa.Text(), nullable=True),
-        sa.Column('created_at', sa.DateTime(), nullable=True),
-        sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ),
-        sa.PrimaryKeyConstraint('id')
+        sa.Column('created_at', sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id'),
+        **_TABLE_KW
     )
-    op.create_index(op.f('ix_quiz_questions_quiz_id'), 'quiz_questions', ['quiz_id'], unique=False)
-    
-    # Create challenge_participants table
+
+    # Create challenge_participants table, widest columns first (see above)
     op.create_table('challenge_participants',
-        sa.Column('id', sa.Integer(), nullable=False),
-        sa.Column('challenge_id', sa.Integer(), nullable=False),
+        sa.Column('id', sa.BigInteger(), sa.Identity(always=False), primary_key=True),
         sa.Column('user_id', sa.BigInteger(), nullable=False),
-        sa.Column('status', sa.String(length=20), nullable=False, server_default='invited'),
         sa.Column('started_at', sa.DateTime(), nullable=True),
         sa.Column('ended_at', sa.DateTime(), nullable=True),
-        sa.Column('completion_time_seconds', sa.Integer(), nullable=True),
-        sa.Column('quiz_score', sa.Integer(), nullable=True),
         sa.Column('quiz_submitted_at', sa.DateTime(), nullable=True),
-        sa.Column('rank', sa.Integer(), nullable=True),
-        sa.Column('trophy', sa.String(length=20), nullable=True),
-        sa.Column('created_at', sa.DateTime(), nullable=True),
-        sa.Column('updated_at', sa.DateTime(), nullable=True),
-        sa.ForeignKeyConstraint(['challenge_id'], ['challenges.id'], ),
-        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
-        sa.PrimaryKeyConstraint('id')
+        sa.Column('created_at', sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        sa.Column('challenge_id', sa.Integer(), nullable=False),
+        sa.Column('completion_time_seconds', sa.Integer(), nullable=True),
+        sa.Column('quiz_score', sa.SmallInteger(), nullable=True),
+        sa.Column('rank', sa.SmallInteger(), nullable=True),
+        sa.Column('status', _enum('participant_status'), nullable=False, server_default='invited'),
+        sa.Column('trophy', _enum('trophy_type'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        **_TABLE_KW
     )
-    op.create_index(op.f('ix_challenge_participants_challenge_id'), 'challenge_participants', ['challenge_id'], unique=False)
-    op.create_index(op.f('ix_challenge_participants_user_id'), 'challenge_participants', ['user_id'], unique=False)
-    
+
     # Create challenge_invitations table
     op.create_table('challenge_invitations',
-        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('id', sa.BigInteger(), sa.Identity(always=False), primary_key=True),
         sa.Column('challenge_id', sa.Integer(), nullable=False),
         sa.Column('sender_id', sa.BigInteger(), nullable=False),
         sa.Column('recipient_id', sa.BigInteger(), nullable=False),
-        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
-        sa.Column('created_at', sa.DateTime(), nullable=True),
-        sa.Column('updated_at', sa.DateTime(), nullable=True),
-        sa.ForeignKeyConstraint(['challenge_id'], ['challenges.id'], ),
-        sa.ForeignKeyConstraint(['recipient_id'], ['users.id'], ),
-        sa.ForeignKeyConstraint(['sender_id'], ['users.id'], ),
-        sa.PrimaryKeyConstraint('id')
+        sa.Column('status', _enum('invitation_status'), nullable=False, server_default='pending'),
+        sa.Column('created_at', sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id'),
+        **_TABLE_KW
     )
-    op.create_index(op.f('ix_challenge_invitations_challenge_id'), 'challenge_invitations', ['challenge_id'], unique=False)
-    op.create_index(op.f('ix_challenge_invitations_recipient_id'), 'challenge_invitations', ['recipient_id'], unique=False)
-    
-    # Create quiz_responses table
-    op.create_table('quiz_responses',
-        sa.Column('id', sa.Integer(), nullable=False),
-        sa.Column('quiz_id', sa.Integer(), nullable=False),
-        sa.Column('user_id', sa.BigInteger(), nullable=False),
-        sa.Column('challenge_id', sa.Integer(), nullable=False),
-        sa.Column('answers', sa.JSON(), nullable=False),
-        sa.Column('score', sa.Integer(), nullable=False),
-        sa.Column('correct_count', sa.Integer(), nullable=False),
-        sa.Column('total_questions', sa.Integer(), nullable=False),
-        sa.Column('started_at', sa.DateTime(), nullable=False),
-        sa.Column('submitted_at', sa.DateTime(), nullable=False),
-        sa.Column('time_taken_seconds', sa.Integer(), nullable=False),
-        sa.Column('created_at', sa.DateTime(), nullable=True),
-        sa.ForeignKeyConstraint(['challenge_id'], ['challenges.id'], ),
-        sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ),
-        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
-        sa.PrimaryKeyConstraint('id')
+
+    # Both tables churn through in-place updates (participant status and
+    # results, invitations flipping pending -> accepted/declined); leaving
+    # 20% free per page keeps those updates HOT (in-page, no index writes)
+    op.execute(
+        "ALTER TABLE challenge_participants SET (fillfactor = 80); "
+        "ALTER TABLE challenge_invitations SET (fillfactor = 80)"
+    )
+
+    # Create quiz_responses as a monthly range partition on created_at:
+    # responses are append-only and always filtered by date, so per-partition
+    # indexes stay small and old months can be detached instead of deleted
+    # row by row. The partition key must be part of the primary key, and a
+    # DEFAULT partition catches rows if the partition-creation job ever lags.
+    op.execute("""
+        CREATE TABLE quiz_responses (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+            user_id BIGINT NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            submitted_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT now(),
+            quiz_id INTEGER NOT NULL,
+            challenge_id INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            time_taken_seconds INTEGER NOT NULL,
+            correct_count SMALLINT NOT NULL,
+            total_questions SMALLINT NOT NULL,
+            -- Computed once at write time so pass/fail predicates never
+            -- recheck the score. 50 mirrors quizzes.passing_score's default;
+            -- a generated column cannot reference the quizzes row itself.
+            passed BOOLEAN GENERATED ALWAYS AS (score >= 50) STORED,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    # Both initial partitions in one round trip (op.execute uses the simple
+    # query protocol, so semicolon-joined statements ship together)
+    op.execute(
+        f"CREATE TABLE {_UNLOGGED}quiz_responses_2025_12 PARTITION OF quiz_responses "
+        "FOR VALUES FROM ('2025-12-01') TO ('2026-01-01'); "
+        f"CREATE TABLE {_UNLOGGED}quiz_responses_default PARTITION OF quiz_responses DEFAULT"
     )
-    op.create_index(op.f('ix_quiz_responses_quiz_id'), 'quiz_responses', ['quiz_id'], unique=False)
-    op.create_index(op.f('ix_quiz_responses_user_id'), 'quiz_responses', ['user_id'], unique=False)
-    op.create_index(op.f('ix_quiz_responses_challenge_id'), 'quiz_responses', ['challenge_id'], unique=False)
-    
-    # Add challenge statistics to users table
-    op.add_column('users', sa.Column('total_challenges', sa.Integer(), nullable=True, server_default='0'))
-    op.add_column('users', sa.Column('challenges_won', sa.Integer(), nullable=True, server_default='0'))
-    op.add_column('users', sa.Column('individual_challenges_won', sa.Integer(), nullable=True, server_default='0'))
-    op.add_column('users', sa.Column('group_challenges_won', sa.Integer(), nullable=True, server_default='0'))
-    op.add_column('users', sa.Column('gold_trophies', sa.Integer(), nullable=True, server_default='0'))
-    op.add_column('users', sa.Column('silver_trophies', sa.Integer(), nullable=True, server_default='0'))
-    op.add_column('users', sa.Column('bronze_trophies', sa.Integer(), nullable=True, server_default='0'))
+
+    # Create quiz_response_answers table: one narrow row per answered question
+    # instead of an opaque JSON blob on quiz_responses, so per-question
+    # analytics can use indexes rather than parsing every response
+    op.create_table('quiz_response_answers',
+        sa.Column('id', sa.BigInteger(), sa.Identity(always=False), primary_key=True),
+        sa.Column('response_id', sa.BigInteger(), nullable=False),
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('selected_option_index', sa.SmallInteger(), nullable=True),
+        sa.Column('selected_answer_boolean', sa.Boolean(), nullable=True),
+        sa.Column('is_correct', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        **_TABLE_KW
+    )
+
+    # Phase 2: all indexes
+    for name, table, columns, kwargs in INDEXES:
+        op.create_index(op.f(name), table, columns, unique=False, **kwargs)
+
+    # Physically order challenge_participants by (challenge_id, rank) so a
+    # leaderboard read touches adjacent heap pages, and analyze more often to
+    # keep stats current under the table's constant status churn. On a fresh
+    # schema CLUSTER is free; see the module docstring before re-running it
+    # on a populated table.
+    op.execute(
+        "CLUSTER challenge_participants USING ix_cp_challenge_rank; "
+        "ALTER TABLE challenge_participants SET (autovacuum_analyze_scale_factor = 0.02)"
+    )
+
+    # Phase 3: all foreign keys, NOT VALID so existing rows are never scanned
+    # here; see the module docstring for the follow-up VALIDATE CONSTRAINT
+    # step. Partitioned quiz_responses is the exception: PostgreSQL < 18
+    # rejects NOT VALID FKs on partitioned tables, and the table is empty at
+    # creation time so validating there is free anyway.
+    for name, source, referent, local_cols, remote_cols, kwargs in FOREIGN_KEYS:
+        op.create_foreign_key(name, source, referent, local_cols, remote_cols,
+                              postgresql_not_valid=(source != 'quiz_responses'),
+                              **kwargs)
+
+    # Add challenge statistics to users table in one ALTER TABLE: one
+    # ACCESS EXCLUSIVE lock acquisition and catalog update instead of seven,
+    # and constant integer defaults make it metadata-only on PostgreSQL
+    op.execute(
+        "ALTER TABLE users "
+        "ADD COLUMN total_challenges SMALLINT DEFAULT 0, "
+        "ADD COLUMN challenges_won SMALLINT DEFAULT 0, "
+        "ADD COLUMN individual_challenges_won SMALLINT DEFAULT 0, "
+        "ADD COLUMN group_challenges_won SMALLINT DEFAULT 0, "
+        "ADD COLUMN gold_trophies SMALLINT DEFAULT 0, "
+        "ADD COLUMN silver_trophies SMALLINT DEFAULT 0, "
+        "ADD COLUMN bronze_trophies SMALLINT DEFAULT 0"
+    )
+
+    # Precomputed leaderboard: reads become an index lookup on the view
+    # instead of aggregating challenge_participants per request. The unique
+    # (challenge_id, user_id) index is what allows the refresh job to use
+    # REFRESH MATERIALIZED VIEW CONCURRENTLY without blocking readers.
+    op.execute(
+        "CREATE MATERIALIZED VIEW challenge_leaderboard_mv AS "
+        "SELECT cp.challenge_id, cp.user_id, cp.rank, "
+        "cp.completion_time_seconds, cp.quiz_score, cp.trophy "
+        "FROM challenge_participants cp "
+        "WHERE cp.status = 'completed'; "
+        "CREATE UNIQUE INDEX ix_clb_mv_challenge_user "
+        "ON challenge_leaderboard_mv (challenge_id, user_id); "
+        "CREATE INDEX ix_clb_mv_challenge_rank "
+        "ON challenge_leaderboard_mv (challenge_id, rank)"
+    )
+
+    # updated_at is maintained by the database: inserts take the now()
+    # default above, and this trigger stamps every UPDATE, so the app never
+    # serializes timestamps into its statements
+    op.execute("""
+        CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at = now();
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("; ".join(
+        f"CREATE TRIGGER trg_{table}_updated_at BEFORE UPDATE ON {table} "
+        "FOR EACH ROW EXECUTE FUNCTION set_updated_at()"
+        for table in ('quizzes', 'challenges', 'challenge_participants', 'challenge_invitations')
+    ))
 
 
 def downgrade():
-    # Drop challenge statistics from users table
-    op.drop_column('users', 'bronze_trophies')
-    op.drop_column('users', 'silver_trophies')
-    op.drop_column('users', 'gold_trophies')
-    op.drop_column('users', 'group_challenges_won')
-    op.drop_column('users', 'individual_challenges_won')
-    op.drop_column('users', 'challenges_won')
-    op.drop_column('users', 'total_challenges')
-    
-    # Drop quiz_responses table
-    op.drop_index(op.f('ix_quiz_responses_challenge_id'), table_name='quiz_responses')
-    op.drop_index(op.f('ix_quiz_responses_user_id'), table_name='quiz_responses')
-    op.drop_index(op.f('ix_quiz_responses_quiz_id'), table_name='quiz_responses')
+    # The view (and its indexes) must go before the tables it selects from
+    op.execute("DROP MATERIALIZED VIEW challenge_leaderboard_mv")
+
+    # Drop challenge statistics from users table in one ALTER TABLE
+    op.execute(
+        "ALTER TABLE users "
+        "DROP COLUMN bronze_trophies, "
+        "DROP COLUMN silver_trophies, "
+        "DROP COLUMN gold_trophies, "
+        "DROP COLUMN group_challenges_won, "
+        "DROP COLUMN individual_challenges_won, "
+        "DROP COLUMN challenges_won, "
+        "DROP COLUMN total_challenges"
+    )
+
+    # Inverse of the upgrade phases: constraints, then indexes, then tables
+    for name, source, _referent, _local_cols, _remote_cols, _kwargs in reversed(FOREIGN_KEYS):
+        op.drop_constraint(name, source, type_='foreignkey')
+
+    for name, table, _columns, _kwargs in reversed(INDEXES):
+        op.drop_index(op.f(name), table_name=table)
+
+    op.drop_table('quiz_response_answers')
     op.drop_table('quiz_responses')
-    
-    # Drop challenge_invitations table
-    op.drop_index(op.f('ix_challenge_invitations_recipient_id'), table_name='challenge_invitations')
-    op.drop_index(op.f('ix_challenge_invitations_challenge_id'), table_name='challenge_invitations')
     op.drop_table('challenge_invitations')
-    
-    # Drop challenge_participants table
-    op.drop_index(op.f('ix_challenge_participants_user_id'), table_name='challenge_participants')
-    op.drop_index(op.f('ix_challenge_participants_challenge_id'), table_name='challenge_participants')
     op.drop_table('challenge_participants')
-    
-    # Drop quiz_questions table
-    op.drop_index(op.f('ix_quiz_questions_quiz_id'), table_name='quiz_questions')
     op.drop_table('quiz_questions')
-    
-    # Drop challenges table
-    op.drop_index(op.f('ix_challenges_status'), table_name='challenges')
-    op.drop_index(op.f('ix_challenges_start_time'), table_name='challenges')
-    op.drop_index(op.f('ix_challenges_challenge_type'), table_name='challenges')
-    op.drop_index(op.f('ix_challenges_creator_id'), table_name='challenges')
     op.drop_table('challenges')
-    
-    # Drop quizzes table
-    op.drop_index(op.f('ix_quizzes_challenge_id'), table_name='quizzes')
     op.drop_table('quizzes')
+
+    # Triggers go with their tables; only the shared function remains
+    op.execute("DROP FUNCTION set_updated_at()")
+
+    # Enum types can only go once no table references them
+    op.execute("; ".join(f"DROP TYPE {name}" for name, _values in reversed(ENUMS)))